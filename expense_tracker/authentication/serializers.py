@@ -82,6 +82,19 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'is_superuser']
 
 
+class UserProfileSerializer(UserSerializer):
+    #User profile with the running balance, read with one primary key lookup
+    balance = serializers.SerializerMethodField()
+    
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + ['balance']
+    
+    def get_balance(self, user):
+        # Imported here so loading the auth views doesn't pull in the expenses app
+        from expenses.balances import balance_summary, get_balance
+        return balance_summary(get_balance(user.pk))
+
+
 class EmailVerificationSerializer(serializers.Serializer):
     #Serializer for email verification
     email = serializers.EmailField()
@@ -1,3 +1,120 @@
-from django.test import TestCase
+import os
+import subprocess
+import sys
+import threading
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from expense_tracker.throttling import CacheBucketStore, LocalBucketStore, _local_store
+
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'throttle': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'throttle-tests'},
+}
+
+
+def take_one(state):
+    # The smallest bucket update: count how many requests got a token
+    tokens = 3 if state is None else state
+    if tokens < 1:
+        return tokens, False
+    return tokens - 1, True
+
+
+class BucketStoreTests(TestCase):
+
+    def take_concurrently(self, store, threads=20):
+        results = []
+        start = threading.Barrier(threads)
+
+        def worker():
+            start.wait()
+            results.append(store.update('bucket', take_one, 60))
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return results
+
+    def test_local_store_never_hands_out_more_tokens_than_it_has(self):
+        results = self.take_concurrently(LocalBucketStore())
+        self.assertEqual(results.count(True), 3)
+
+    @override_settings(CACHES=TEST_CACHES)
+    def test_cache_store_never_hands_out_more_tokens_than_it_has(self):
+        caches['throttle'].clear()
+        results = self.take_concurrently(CacheBucketStore('throttle'))
+        self.assertEqual(results.count(True), 3)
+        self.assertIsNone(caches['throttle'].get('bucket:lock'))
+
+
+    @override_settings(CACHES=TEST_CACHES)
+    def test_a_waiter_that_times_out_leaves_the_holders_lock_alone(self):
+        store = CacheBucketStore('throttle')
+        store.lock_timeout = 0.05
+        cache = caches['throttle']
+        cache.clear()
+        cache.set('bucket:lock', 'held by another worker', 60)
+
+        self.assertTrue(store.update('bucket', take_one, 60))
+        self.assertEqual(cache.get('bucket:lock'), 'held by another worker')
+        cache.delete('bucket:lock')
+        self.assertTrue(store.update('bucket', take_one, 60))
+        self.assertIsNone(cache.get('bucket:lock'))
+
+@override_settings(RATE_LIMITS={'rest_login': {'ip': '3/min'}})
+class LoginThrottleTests(TestCase):
+
+    def setUp(self):
+        _local_store.clear()
+        self.client = APIClient()
+
+    def login(self, ip='10.0.0.1'):
+        return self.client.post('/auth/login/', {'username': 'nobody', 'password': 'wrong'}, REMOTE_ADDR=ip)
+
+    def test_requests_over_the_limit_are_rejected(self):
+        statuses = [self.login().status_code for _ in range(4)]
+        self.assertNotIn(429, statuses[:3])
+        self.assertEqual(statuses[3], 429)
+
+    def test_each_address_has_its_own_bucket(self):
+        for _ in range(3):
+            self.login()
+        self.assertEqual(self.login().status_code, 429)
+        self.assertNotEqual(self.login(ip='10.0.0.2').status_code, 429)
+
+    @override_settings(CACHES=TEST_CACHES, RATE_LIMIT_BACKEND='throttle')
+    def test_shared_cache_backend(self):
+        caches['throttle'].clear()
+        statuses = [self.login().status_code for _ in range(4)]
+        self.assertEqual(statuses.count(429), 1)
+
+
+class ProfileTests(TestCase):
+
+    def test_profile_includes_the_running_balance(self):
+        user = User.objects.create_user('alice', 'alice@example.com', 'password')
+        client = APIClient()
+        client.force_authenticate(user)
+        client.post('/api/expenses/create/', {'title': 'Pay', 'amount': '100.00', 'transaction_type': 'credit'}, format='json')
+
+        balance = client.get('/auth/profile/').json()['balance']
+        self.assertEqual(balance['currencies'][0]['currency'], 'USD')
+        self.assertEqual(Decimal(str(balance['currencies'][0]['balance'])), Decimal('100.00'))
+
+    def test_auth_views_load_without_the_expenses_app(self):
+        # Lazily loaded views: importing the auth views must not import expenses modules
+        code = (
+            "import sys, django; django.setup(); import authentication.views; "
+            "print(sorted(m for m in sys.modules if m.startswith('expenses.') and m not in ('expenses.apps', 'expenses.models')))"
+        )
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'expense_tracker.settings_api'}
+        output = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), '[]')
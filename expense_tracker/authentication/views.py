@@ -1,6 +1,6 @@
 from django.shortcuts import render
 from rest_framework import status, generics
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -11,10 +11,12 @@ from .serializers import (
     UserRegistrationSerializer, 
     UserLoginSerializer, 
     UserSerializer,
+    UserProfileSerializer,
     EmailVerificationSerializer,
     ResendEmailVerificationSerializer
 )
 from .models import EmailVerification
+from expense_tracker.throttling import IPTokenBucketThrottle
 
 
 def send_verification_email_to_terminal(user, verification_key):
@@ -33,6 +35,7 @@ class UserRegistrationView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserRegistrationSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [IPTokenBucketThrottle]
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -61,6 +64,7 @@ class UserLoginView(generics.GenericAPIView):
     """
     serializer_class = UserLoginSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [IPTokenBucketThrottle]
     
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -118,6 +122,7 @@ def verify_email_view(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([IPTokenBucketThrottle])
 def resend_email_verification_view(request):
     """
     Resend email verification endpoint
@@ -215,5 +220,5 @@ def logout_view(request):
 @permission_classes([IsAuthenticated])
 def user_profile_view(request):
    
-    serializer = UserSerializer(request.user)
+    serializer = UserProfileSerializer(request.user)
     return Response(serializer.data, status=status.HTTP_200_OK)
@@ -0,0 +1,50 @@
+from django.urls import URLResolver, get_resolver
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+
+
+class LazyView:
+    """
+    URL callback that imports its view on the first request instead of when
+    the URLconf is loaded, so a worker only pays for the views it serves.
+
+    Only for Django REST Framework views: they are CSRF exempt (DRF runs its
+    own CSRF check for session authentication), and the middleware has to
+    see that before the real view is imported.
+    """
+    csrf_exempt = True
+
+    def __init__(self, dotted_path):
+        self.dotted_path = dotted_path
+
+    def __repr__(self):
+        return f"LazyView({self.dotted_path!r})"
+
+    @cached_property
+    def view(self):
+        view = import_string(self.dotted_path)
+        # class based views are given by their class
+        if isinstance(view, type):
+            view = view.as_view()
+        return view
+
+    def __call__(self, request, *args, **kwargs):
+        return self.view(request, *args, **kwargs)
+
+
+def lazy_view(dotted_path):
+    return LazyView(dotted_path)
+
+
+def preload_views(patterns=None):
+    """
+    Import every lazy view now. Called in the master process of a
+    preforking server so workers share the imported modules.
+    """
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            preload_views(pattern.url_patterns)
+        elif isinstance(pattern.callback, LazyView):
+            pattern.callback.view
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 from datetime import timedelta
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -168,6 +169,51 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
+# Currency used as the pivot for ExchangeRate rows; every rate is the value of
+# one unit of a currency expressed in this one
+BASE_CURRENCY = 'USD'
+
+# Rate limiting
+# Token bucket limits per route, keyed by URL name. 'user' limits each
+# authenticated user and 'ip' limits each client address.
+RATE_LIMITS = {
+    'rest_register': {'ip': '5/hour'},
+    'rest_login': {'ip': '10/min'},
+    'rest_resend_email': {'ip': '3/hour'},
+    'create_expense': {'user': '60/min', 'ip': '120/min'},
+}
+
+# 'local' keeps the buckets in process memory; any other value is used as a
+# CACHES alias so limits can be shared between workers (e.g. a redis cache)
+RATE_LIMIT_BACKEND = 'local'
+
+# How long a stored Idempotency-Key response can be replayed
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+
+# Deleted expense/income records can be restored until purge_deleted
+# removes them this long after deletion
+SOFT_DELETE_RETENTION = timedelta(days=30)
+
+# Change log of expense/income writes. 'batched' buffers entries in each
+# process and inserts them in bulk (a crash can lose the last few seconds);
+# 'sync' inserts each entry in the same transaction as the write.
+AUDIT_LOG_MODE = 'batched'
+AUDIT_LOG_BATCH_SIZE = 500
+AUDIT_LOG_FLUSH_INTERVAL = 2  # seconds
+# Entries kept per process while the database can't be written; more are dropped
+AUDIT_LOG_MAX_BUFFERED = 50000
+
+# Yearly reports: finished reports are cached until the user's data changes,
+# and reports over REPORT_POOL_MIN_ROWS rows are computed in a process pool.
+# REPORT_CACHE is the CACHES alias they are kept in; with several server
+# processes it must be a shared cache (e.g. redis), see `check --deploy`.
+REPORT_CACHE = 'default'
+REPORT_CACHE_TIMEOUT = 60 * 60
+# How long a report can be in the pool before another process may submit it
+REPORT_PENDING_TIMEOUT = 10 * 60
+REPORT_POOL_MIN_ROWS = 20000
+REPORT_POOL_WORKERS = 2
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -175,3 +221,5 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
@@ -0,0 +1,166 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+
+def parse_rate(rate):
+    """Turn a rate string like '10/min' into (number of requests, seconds)"""
+    num, period = rate.split('/')
+    duration = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+    return int(num), duration
+
+
+class LocalBucketStore:
+    """
+    In-process bucket store. Each key holds a single (tokens, timestamp)
+    pair so lookups and updates are O(1). The least recently used keys are
+    dropped once max_entries is reached so memory stays bounded.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(self, key, func, timeout):
+        """
+        Replace the state of `key` with func(state)[0] and return
+        func(state)[1]. The lock is held across the read and the write, so
+        concurrent requests can't spend the same token.
+        """
+        with self._lock:
+            state, result = func(self._buckets.get(key))
+            self._buckets[key] = state
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+            return result
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Bucket store backed by one of the configured Django cache aliases.
+    Updates hold a short lock key taken with cache.add(), which is atomic
+    on every backend, so workers sharing the cache can't all read the same
+    token count. The lock holds a token unique to its holder, which only
+    deletes the lock if it still holds that token. A lock left behind by a
+    crashed worker expires after `lock_timeout` seconds. There is no
+    clear(): the cache API can't list keys, and the alias may hold other
+    data.
+    """
+    lock_timeout = 1
+    lock_poll = 0.005
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def update(self, key, func, timeout):
+        lock_key = f"{key}:lock"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_timeout
+        acquired = self.cache.add(lock_key, token, self.lock_timeout)
+        while not acquired and time.monotonic() < deadline:
+            time.sleep(self.lock_poll)
+            acquired = self.cache.add(lock_key, token, self.lock_timeout)
+        # Past the deadline the holder is gone and its lock about to expire;
+        # go on without the lock rather than block the request
+        try:
+            state, result = func(self.cache.get(key))
+            self.cache.set(key, state, timeout)
+            return result
+        finally:
+            if acquired and self.cache.get(lock_key) == token:
+                self.cache.delete(lock_key)
+
+
+_local_store = LocalBucketStore()
+
+
+def get_bucket_store():
+    backend = getattr(settings, 'RATE_LIMIT_BACKEND', 'local')
+    if backend == 'local':
+        return _local_store
+    return CacheBucketStore(backend)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket throttle configured per route.
+
+    The route is identified by its URL name and looked up in
+    settings.RATE_LIMITS, e.g. {'rest_login': {'ip': '10/min'}}. A bucket
+    holds up to N tokens and refills at N per period, so short bursts are
+    allowed while the long-run rate stays capped. Routes without a rate for
+    this throttle's `kind` are never throttled.
+    """
+    kind = None
+    timer = time.time
+
+    def get_ident_key(self, request):
+        raise NotImplementedError('.get_ident_key() must be overridden')
+
+    def get_rate(self, request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return None
+        route_limits = getattr(settings, 'RATE_LIMITS', {}).get(match.url_name, {})
+        return route_limits.get(self.kind)
+
+    def allow_request(self, request, view):
+        rate = self.get_rate(request)
+        if rate is None:
+            return True
+
+        ident = self.get_ident_key(request)
+        if ident is None:
+            return True
+
+        self.capacity, self.duration = parse_rate(rate)
+        self.refill_per_second = self.capacity / self.duration
+        key = f"throttle:{request.resolver_match.url_name}:{self.kind}:{ident}"
+
+        now = self.timer()
+
+        def take(state):
+            if state is None:
+                tokens = self.capacity
+            else:
+                tokens, last_seen = state
+                tokens = min(self.capacity, tokens + (now - last_seen) * self.refill_per_second)
+            if tokens < 1:
+                return (tokens, now), tokens
+            return (tokens - 1, now), tokens
+
+        self.tokens = get_bucket_store().update(key, take, self.duration)
+        return self.tokens >= 1
+
+    def wait(self):
+        # seconds until the bucket has refilled enough for one more request
+        return (1 - self.tokens) / self.refill_per_second
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Limits each authenticated user; anonymous requests are left to the IP throttle"""
+    kind = 'user'
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """Limits each client address"""
+    kind = 'ip'
+
+    def get_ident_key(self, request):
+        return self.get_ident(request)
@@ -14,11 +14,18 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
 
+# The app URLconfs point at their views through lazy_view(), so view modules
+# are imported on first use (or up front by preload_views() in wsgi.py)
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('auth/', include('authentication.urls')),
     path('api/', include('expenses.urls')),
 ]
+
+# The API-only settings profile leaves the admin out
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
@@ -7,6 +7,7 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
 
+import gc
 import os
 
 from django.core.wsgi import get_wsgi_application
@@ -14,3 +15,13 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'expense_tracker.settings')
 
 application = get_wsgi_application()
+
+# With DJANGO_PRELOAD set (gunicorn --preload, see gunicorn.conf.py) this
+# module is imported once in the master. Import every view there and freeze
+# the objects created so far so forked workers share those memory pages
+# instead of each importing (and the GC touching) their own copies.
+if os.environ.get('DJANGO_PRELOAD'):
+    from expense_tracker.lazy import preload_views
+
+    preload_views()
+    gc.freeze()
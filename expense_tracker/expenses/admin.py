@@ -1,15 +1,272 @@
+from datetime import datetime
+from decimal import Decimal
+from django import forms
 from django.contrib import admin
-from .models import ExpenseIncome
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Min, Max
+from django.utils import timezone
+from . import audit
+from .balances import recompute_balances
+from .budgets import recompute_record_periods
+from .models import ExpenseIncome, ExpenseIncomeChange, ExpenseIncomeQuerySet, ExchangeRate, Category, Tag, RecurringRule, Budget
+from .pagination import EstimatedCountPaginator
+from .purge import purge_user
+
+
+# What decides the budget periods a record counts in
+RECORD_PERIOD_FIELDS = ['user_id', 'currency', 'category_id', 'created_at']
+
+
+class DateRangeQuerySet(ExpenseIncomeQuerySet):
+    """
+    Changelist queryset whose year and month lists for the date hierarchy
+    come from MIN/MAX of the selection (two index lookups) instead of a
+    DISTINCT over every matching row. Periods without records may be
+    listed; they just lead to an empty page.
+    """
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None):
+        if kind not in ('year', 'month'):
+            return super().datetimes(field_name, kind, order, tzinfo)
+
+        bounds = self.aggregate(first=Min(field_name), last=Max(field_name))
+        if bounds['first'] is None:
+            return []
+        first = timezone.localtime(bounds['first'])
+        last = timezone.localtime(bounds['last'])
+
+        periods = []
+        year, month = first.year, first.month if kind == 'month' else 1
+        end = (last.year, last.month if kind == 'month' else 1)
+        while (year, month) <= end:
+            periods.append(datetime(year, month, 1, tzinfo=timezone.get_current_timezone()))
+            if kind == 'year':
+                year += 1
+            else:
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return periods if order == 'ASC' else periods[::-1]
+
+
+class ExpenseIncomeAdminForm(forms.ModelForm):
+    """Categories and tags can only come from the record owner's own set"""
+
+    class Meta:
+        model = ExpenseIncome
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        user = cleaned_data.get('user')
+        category = cleaned_data.get('category')
+        if user and category and category.user_id != user.pk:
+            self.add_error('category', "This category belongs to another user.")
+        tags = cleaned_data.get('tags')
+        if user and tags and any(tag.user_id != user.pk for tag in tags):
+            self.add_error('tags', "Some of these tags belong to another user.")
+        return cleaned_data
 
 
 @admin.register(ExpenseIncome)
 class ExpenseIncomeAdmin(admin.ModelAdmin):
-    list_display = ['title', 'user', 'amount', 'transaction_type', 'tax', 'tax_type', 'total', 'created_at']
-    list_filter = ['transaction_type', 'tax_type', 'created_at', 'user']
-    search_fields = ['title', 'description', 'user__username']
-    readonly_fields = ['created_at', 'updated_at']
+    list_display = ['title', 'user', 'amount', 'currency', 'transaction_type', 'tax', 'tax_type', 'total', 'category', 'created_at']
+    # Low-cardinality filters only; users are found through search or autocomplete
+    # rather than a filter listing every account
+    list_filter = ['transaction_type', 'tax_type']
+    list_select_related = ['user', 'category']
+    search_fields = ['title', 'user__username']
+    # Category and tag choices are the owner's own, see get_form()
+    autocomplete_fields = ['user']
+    form = ExpenseIncomeAdminForm
+    readonly_fields = ['created_at', 'updated_at', 'recurring_rule', 'occurrence_date', 'deleted_at']
     ordering = ['-created_at']
+    date_hierarchy = 'created_at'
+    # Avoid COUNT(*) over the whole table on every changelist load
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['mark_as_debit', 'mark_as_credit', 'clear_tax']
+    
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return DateRangeQuerySet(model=queryset.model, query=queryset.query, using=queryset.db)
+    
+    def get_readonly_fields(self, request, obj=None):
+        # Until the record has an owner there is no set of categories and
+        # tags to choose from; they are picked after the first save
+        if obj is None:
+            return self.readonly_fields + ['category', 'tags']
+        return self.readonly_fields
+    
+    def get_form(self, request, obj=None, **kwargs):
+        form = super().get_form(request, obj, **kwargs)
+        if obj is not None:
+            form.base_fields['category'].queryset = Category.objects.filter(user_id=obj.user_id)
+            form.base_fields['tags'].queryset = Tag.objects.filter(user_id=obj.user_id)
+        return form
     
     def total(self, obj):
         return obj.total
     total.short_description = 'Total Amount'
+    
+    # Bulk actions run a single UPDATE over the selection, then re-sum the
+    # balances of the affected users and the budget periods the records fall
+    # in, since their running totals changed. update() skips auto_now, so
+    # updated_at is set here.
+    def _bulk_update(self, request, queryset, **changes):
+        # Old values of the changed columns, for the change log and the budgets
+        before = list(queryset.values('pk', 'user_id', 'currency', 'category_id', 'created_at', *changes))
+        new_values = {name: audit.json_value(value) for name, value in changes.items()}
+        entries = []
+        for row in before:
+            old_values = {name: audit.json_value(row[name]) for name in changes}
+            changed = audit.diff(old_values, new_values)
+            if changed:
+                entries.append((row['pk'], 'update', changed, request.user.id))
+        with transaction.atomic():
+            updated = queryset.update(updated_at=timezone.now(), **changes)
+            audit.log_changes(entries)
+        self._recompute_totals(before)
+        self.message_user(request, f"{updated} records updated.")
+    
+    def _recompute_totals(self, records):
+        """`records` are instances or values() rows of the changed records, before and after the change"""
+        keys = [
+            tuple(row[field] if isinstance(row, dict) else getattr(row, field) for field in RECORD_PERIOD_FIELDS)
+            for row in records
+        ]
+        recompute_balances(list({key[0] for key in keys}), written=True)
+        recompute_record_periods(keys)
+    
+    # Tags edited here are not in the change log, only the record's own fields
+    def save_model(self, request, obj, form, change):
+        previous = ExpenseIncome.objects.get(pk=obj.pk) if change else None
+        super().save_model(request, obj, form, change)
+        before = audit.snapshot(previous) if previous else {}
+        changes = audit.diff(before, audit.snapshot(obj))
+        if changes:
+            audit.log_change(obj.pk, 'update' if change else 'create', changes, actor_id=request.user.id)
+        self._recompute_totals([obj, previous] if previous else [obj])
+    
+    # Deleting from the admin soft deletes too; purge_deleted removes the rows later
+    def delete_model(self, request, obj):
+        if not obj.soft_delete():
+            return
+        audit.log_change(obj.pk, 'delete', {'deleted_at': [None, obj.deleted_at]}, actor_id=request.user.id)
+        self._recompute_totals([obj])
+    
+    def delete_queryset(self, request, queryset):
+        now = timezone.now()
+        with transaction.atomic():
+            queryset = queryset.filter(deleted_at__isnull=True).select_for_update()
+            rows = list(queryset.values('pk', *RECORD_PERIOD_FIELDS))
+            ExpenseIncome.all_objects.filter(pk__in=[row['pk'] for row in rows]).update(deleted_at=now, updated_at=now)
+            audit.log_changes([(row['pk'], 'delete', {'deleted_at': [None, now]}, request.user.id) for row in rows])
+        self._recompute_totals(rows)
+    
+    @admin.action(description='Mark selected records as debit')
+    def mark_as_debit(self, request, queryset):
+        self._bulk_update(request, queryset, transaction_type='debit')
+    
+    @admin.action(description='Mark selected records as credit')
+    def mark_as_credit(self, request, queryset):
+        self._bulk_update(request, queryset, transaction_type='credit')
+    
+    @admin.action(description='Remove tax from selected records')
+    def clear_tax(self, request, queryset):
+        self._bulk_update(request, queryset, tax=Decimal('0.00'), tax_type='flat')
+
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ['currency', 'date', 'rate']
+    list_filter = ['currency']
+    ordering = ['-date', 'currency']
+
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ['name', 'user', 'created_at']
+    search_fields = ['name', 'user__username']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user')
+
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ['name', 'user']
+    search_fields = ['name', 'user__username']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user')
+
+
+@admin.register(RecurringRule)
+class RecurringRuleAdmin(admin.ModelAdmin):
+    list_display = ['title', 'user', 'amount', 'transaction_type', 'frequency', 'interval', 'next_run', 'is_active']
+    list_filter = ['frequency', 'is_active']
+    search_fields = ['title', 'user__username']
+    readonly_fields = ['occurrences_created', 'next_run', 'created_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user')
+
+
+@admin.register(Budget)
+class BudgetAdmin(admin.ModelAdmin):
+    list_display = ['name', 'user', 'category', 'period', 'limit', 'currency', 'alert_threshold']
+    list_filter = ['period', 'currency']
+    search_fields = ['name', 'user__username']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'category')
+
+
+@admin.register(ExpenseIncomeChange)
+class ExpenseIncomeChangeAdmin(admin.ModelAdmin):
+    """Read-only: the change log is append-only"""
+    list_display = ['record_id', 'action', 'actor_id', 'created_at']
+    list_filter = ['action']
+    search_fields = ['=record_id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class AccountAdmin(UserAdmin):
+    """
+    Deleting an account goes through purge_user(), which removes its
+    records chunk by chunk, instead of one cascading delete of the whole
+    history in a single transaction.
+    """
+
+    def get_deleted_objects(self, objs, request):
+        # The default page lists every related row, loading the whole history
+        user_ids = [user.pk for user in objs]
+        records = ExpenseIncome.all_objects.filter(user_id__in=user_ids).count()
+        deleted_objects = [f"User: {user}" for user in objs]
+        model_count = {User._meta.verbose_name_plural: len(user_ids), ExpenseIncome._meta.verbose_name_plural: records}
+        perms_needed = set()
+        if records and not request.user.has_perm('expenses.delete_expenseincome'):
+            perms_needed.add(ExpenseIncome._meta.verbose_name)
+        return deleted_objects, model_count, perms_needed, []
+
+    def delete_model(self, request, obj):
+        purge_user(obj.pk)
+
+    def delete_queryset(self, request, queryset):
+        for user_id in queryset.values_list('pk', flat=True):
+            purge_user(user_id)
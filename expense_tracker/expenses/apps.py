@@ -1,6 +1,31 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+# Cache backends whose data is private to one process
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def check_report_cache(app_configs, **kwargs):
+    """Yearly reports and their pending markers must be shared between server processes"""
+    backend = settings.CACHES.get(settings.REPORT_CACHE, {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        f"REPORT_CACHE ({settings.REPORT_CACHE!r}) uses {backend.rsplit('.', 1)[-1]}, which each server process keeps "
+        "to itself, so large yearly reports are computed again by every process a client retries on.",
+        hint="Point REPORT_CACHE at a shared cache such as redis, or run a single server process.",
+        id='expenses.W001',
+    )]
 
 
 class ExpensesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'expenses'
+
+    def ready(self):
+        register(check_report_cache, Tags.caches, deploy=True)
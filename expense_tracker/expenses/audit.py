@@ -0,0 +1,169 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+
+from .models import ExpenseIncomeChange
+
+
+logger = logging.getLogger(__name__)
+
+# Fields whose changes are logged; tags are logged when they are written
+TRACKED_FIELDS = [
+    'title', 'description', 'amount', 'transaction_type', 'tax', 'tax_type',
+    'currency', 'category', 'recurring_rule', 'occurrence_date', 'user',
+]
+
+_encoder = DjangoJSONEncoder()
+
+
+def json_value(value):
+    # Same representation the JSONField will store, so values compare equal
+    if value is None or isinstance(value, (str, int, bool)):
+        return value
+    return _encoder.default(value)
+
+
+def snapshot(expense, tags=None):
+    """The tracked values of an expense, JSON ready. Pass `tags` to include them."""
+    values = {}
+    for name in TRACKED_FIELDS:
+        field = expense._meta.get_field(name)
+        value = getattr(expense, field.attname)
+        # Unsaved form values may be Decimal('0') where the database has 0.00
+        if isinstance(field, models.DecimalField) and value is not None:
+            value = Decimal(value).quantize(Decimal(1).scaleb(-field.decimal_places))
+        values[name] = json_value(value)
+    if tags is not None:
+        values['tags'] = sorted(tag.pk if hasattr(tag, 'pk') else tag for tag in tags)
+    return values
+
+
+def diff(before, after):
+    return {
+        name: [before.get(name), value]
+        for name, value in after.items()
+        if before.get(name) != value
+    }
+
+
+class ChangeBuffer:
+    """
+    Change log entries waiting to be written. They are inserted with one
+    bulk_create when AUDIT_LOG_BATCH_SIZE entries are waiting, every
+    AUDIT_LOG_FLUSH_INTERVAL seconds from a background thread, before a
+    history read, and when the process exits. Entries still buffered when a
+    process is killed are lost; use AUDIT_LOG_MODE = 'sync' if that is not
+    acceptable.
+
+    While the database can't be written, failed entries are kept for the
+    next flush, up to AUDIT_LOG_MAX_BUFFERED; entries beyond that are
+    dropped and counted in an error log line, so memory stays bounded.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.flusher_pid = None
+
+    def add(self, entry):
+        with self.lock:
+            if len(self.entries) < settings.AUDIT_LOG_MAX_BUFFERED:
+                self.entries.append(entry)
+            else:
+                self.dropped += 1
+            full = len(self.entries) >= settings.AUDIT_LOG_BATCH_SIZE
+        self.start_flusher()
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            entries, self.entries = self.entries, []
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            logger.error("Dropped %d change log entries, the buffer was full", dropped)
+        if not entries:
+            return 0
+        try:
+            ExpenseIncomeChange.objects.bulk_create(entries, batch_size=settings.AUDIT_LOG_BATCH_SIZE)
+        except Exception:
+            # Keep them for the next flush rather than failing the request
+            # whose write has already been committed
+            logger.exception("Could not write %d change log entries", len(entries))
+            with self.lock:
+                self.entries[:0] = entries
+                overflow = len(self.entries) - settings.AUDIT_LOG_MAX_BUFFERED
+                if overflow > 0:
+                    del self.entries[settings.AUDIT_LOG_MAX_BUFFERED:]
+                    self.dropped += overflow
+            return 0
+        return len(entries)
+
+    def start_flusher(self):
+        # Threads don't survive fork, so each worker process starts its own
+        if self.flusher_pid == os.getpid():
+            return
+        with self.lock:
+            if self.flusher_pid == os.getpid():
+                return
+            self.flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_periodically, name='audit-log-flusher', daemon=True).start()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(settings.AUDIT_LOG_FLUSH_INTERVAL)
+            self.flush()
+            connection.close()
+
+
+buffer = ChangeBuffer()
+atexit.register(buffer.flush)
+
+
+def log_change(record_id, action, changes, actor_id=None):
+    """
+    Record one write to an ExpenseIncome row. Call it inside the write's
+    transaction: in 'sync' mode the entry is inserted there and then, in
+    'batched' mode it is buffered once the transaction commits, so rolled
+    back writes are never logged.
+    """
+    entry = ExpenseIncomeChange(record_id=record_id, actor_id=actor_id, action=action, changes=changes)
+    if settings.AUDIT_LOG_MODE == 'sync':
+        entry.save()
+    else:
+        transaction.on_commit(lambda: buffer.add(entry))
+
+
+def log_changes(entries):
+    """Several (record_id, action, changes, actor_id) at once, e.g. after a bulk update"""
+    entries = [
+        ExpenseIncomeChange(record_id=record_id, actor_id=actor_id, action=action, changes=changes)
+        for record_id, action, changes, actor_id in entries
+    ]
+    if settings.AUDIT_LOG_MODE == 'sync':
+        ExpenseIncomeChange.objects.bulk_create(entries, batch_size=settings.AUDIT_LOG_BATCH_SIZE)
+        return
+
+    def add_all():
+        for entry in entries:
+            buffer.add(entry)
+    transaction.on_commit(add_all)
+
+
+def history(record_id):
+    """
+    Change log of one record, oldest first. This process's buffer is
+    flushed first, but in 'batched' mode entries buffered by other server
+    processes show up only after their next flush, at most
+    AUDIT_LOG_FLUSH_INTERVAL seconds later.
+    """
+    buffer.flush()
+    return ExpenseIncomeChange.objects.filter(record_id=record_id).order_by('created_at', 'id')
@@ -0,0 +1,175 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .budgets import to_money
+from .models import Balance, ExpenseIncome
+
+
+# Lost compare-and-swap races before a writer falls back to locking the row
+OPTIMISTIC_ATTEMPTS = 3
+
+
+def change(expense, sign=1):
+    """The (currency, transaction type, amount) an expense adds to its owner's balance"""
+    return (expense.currency, expense.transaction_type, to_money(expense.total) * sign)
+
+
+def apply_changes(totals, changes):
+    """New `totals` dict with the changes added; currencies that net to zero are dropped"""
+    totals = {currency: dict(values) for currency, values in totals.items()}
+    for currency, transaction_type, amount in changes:
+        values = totals.setdefault(currency, {'credit': '0.00', 'debit': '0.00'})
+        values[transaction_type] = str(to_money(Decimal(values[transaction_type]) + amount))
+    return {
+        currency: values
+        for currency, values in totals.items()
+        if Decimal(values['credit']) or Decimal(values['debit'])
+    }
+
+
+def update_balance(user_id, changes):
+    """
+    Apply changes to a user's stored balance. Call it after the records are
+    written, inside the same transaction, with the changed records locked
+    (select_for_update) so the changes are computed from their current
+    values.
+
+    The row is read, the new totals computed and saved only if `version` is
+    still the one that was read, so concurrent writes from several devices
+    can't overwrite each other's totals. After OPTIMISTIC_ATTEMPTS lost races
+    the row is locked with select_for_update instead. A user without a
+    balance row gets one summed from the records, which already include
+    this change. If a concurrent first write creates the row first, it was
+    summed without this change, which is then applied to it like any other.
+    """
+    for _ in range(OPTIMISTIC_ATTEMPTS):
+        balance = Balance.objects.filter(pk=user_id).first()
+        if balance is None:
+            totals = actual_totals([user_id])[user_id]
+            try:
+                with transaction.atomic():
+                    Balance.objects.create(user_id=user_id, totals=totals, version=1)
+                return
+            except IntegrityError:
+                continue
+        updated = Balance.objects.filter(pk=user_id, version=balance.version).update(
+            totals=apply_changes(balance.totals, changes),
+            version=F('version') + 1,
+            updated_at=timezone.now(),
+        )
+        if updated:
+            return
+
+    with transaction.atomic():
+        balance = Balance.objects.select_for_update().get(pk=user_id)
+        balance.totals = apply_changes(balance.totals, changes)
+        balance.version += 1
+        balance.save(update_fields=['totals', 'version', 'updated_at'])
+
+
+def apply_expense(expense, sign=1):
+    update_balance(expense.user_id, [change(expense, sign)])
+
+
+def replace_expense(before, after):
+    """Move an updated expense from its old values to its new ones in one write"""
+    if before.user_id != after.user_id:
+        apply_expense(before, sign=-1)
+        apply_expense(after)
+        return
+    update_balance(after.user_id, [change(before, sign=-1), change(after)])
+
+
+def get_balance(user_id):
+    """The user's balance row; created from their records if there is none yet"""
+    balance = Balance.objects.filter(pk=user_id).first()
+    if balance is None:
+        recompute_balances([user_id])
+        balance = Balance.objects.get(pk=user_id)
+    return balance
+
+
+def balance_summary(balance):
+    # Amounts as 2-place strings, like the rest of the API
+    return {
+        'version': balance.version,
+        'currencies': [
+            {
+                'currency': currency,
+                'total_credit': values['credit'],
+                'total_debit': values['debit'],
+                'balance': str(Decimal(values['credit']) - Decimal(values['debit'])),
+            }
+            for currency, values in sorted(balance.totals.items())
+        ],
+    }
+
+
+def actual_totals(user_ids):
+    """
+    Balances of the given users summed from their records in one query.
+    Rows are streamed and each total rounded like the running balance does,
+    so the result matches it to the cent on every database.
+    """
+    totals = {user_id: {} for user_id in user_ids}
+    rows = ExpenseIncome.objects.filter(user_id__in=user_ids).values_list(
+        'user_id', 'currency', 'transaction_type', 'amount', 'tax', 'tax_type',
+    ).order_by()
+    for user_id, currency, transaction_type, amount, tax, tax_type in rows.iterator(chunk_size=2000):
+        total = to_money(ExpenseIncome.compute_total(amount, tax, tax_type))
+        values = totals[user_id].setdefault(currency, {'credit': Decimal('0.00'), 'debit': Decimal('0.00')})
+        values[transaction_type] += total
+    return {
+        user_id: apply_changes({}, [
+            (currency, transaction_type, amount)
+            for currency, values in by_currency.items()
+            for transaction_type, amount in values.items()
+        ])
+        for user_id, by_currency in totals.items()
+    }
+
+
+def recompute_balances(user_ids, dry_run=False, written=False):
+    """
+    Compare the stored balances of the given users with their records and
+    fix the ones that drifted or are missing, with one grouped query and a
+    bulk write for the whole batch. Returns the ids of the users whose
+    balance was wrong.
+
+    Pass `written=True` after writing the users' records outside the write
+    views: every version is then bumped, even where the totals came out the
+    same, since caches keyed on it (yearly reports) hold other fields too.
+    """
+    actual = actual_totals(user_ids)
+    stored = Balance.objects.in_bulk(user_ids)
+
+    to_create = []
+    to_update = []
+    wrong = []
+    for user_id, totals in actual.items():
+        balance = stored.get(user_id)
+        if balance is None:
+            to_create.append(Balance(user_id=user_id, totals=totals, version=1))
+            # a missing row is only wrong if the user has records
+            if totals:
+                wrong.append(user_id)
+        elif apply_changes(balance.totals, []) != totals:
+            balance.totals = totals
+            balance.version += 1
+            balance.updated_at = timezone.now()
+            to_update.append(balance)
+            wrong.append(user_id)
+
+    if not dry_run:
+        with transaction.atomic():
+            # ignore_conflicts: a concurrent write may have created the row meanwhile
+            Balance.objects.bulk_create(to_create, ignore_conflicts=True)
+            Balance.objects.bulk_update(to_update, ['totals', 'version', 'updated_at'])
+            if written:
+                unchanged = set(stored) - {balance.pk for balance in to_update}
+                Balance.objects.filter(pk__in=unchanged).update(version=F('version') + 1, updated_at=timezone.now())
+
+    return wrong
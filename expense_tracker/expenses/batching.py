@@ -0,0 +1,35 @@
+def pk_ranges(queryset, chunk_size=1000, start_after=0):
+    """
+    Split `queryset` into primary key ranges of at most `chunk_size` rows and
+    yield them as (after, upto): the rows with after < pk <= upto. Only the
+    primary key index is read, one row per range, so the table can be any
+    size. Primary keys must be integers.
+    """
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    after = start_after
+    while True:
+        upto = pks.filter(pk__gt=after)[chunk_size - 1:chunk_size].first()
+        if upto is None:
+            # last, partial chunk
+            upto = pks.filter(pk__gt=after).last()
+            if upto is not None:
+                yield after, upto
+            return
+        yield after, upto
+        after = upto
+
+
+def rows_in_range(queryset, after, upto):
+    """Stream the rows of one pk range without caching them on the queryset"""
+    return queryset.filter(pk__gt=after, pk__lte=upto).order_by('pk').iterator(chunk_size=2000)
+
+
+def iterate_in_chunks(queryset, chunk_size=1000, start_after=0):
+    """
+    Walk `queryset` in primary key order, yielding a list of at most
+    `chunk_size` instances at a time. Use it instead of iterating
+    `queryset.all()`: only one chunk is held in memory however large the
+    table is.
+    """
+    for after, upto in pk_ranges(queryset, chunk_size, start_after):
+        yield list(rows_in_range(queryset, after, upto))
@@ -0,0 +1,225 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncWeek, TruncMonth, TruncYear
+from django.utils import timezone
+
+from .models import Budget, BudgetPeriod, ExpenseIncome
+
+
+PERIOD_TRUNCATE = {
+    'weekly': TruncWeek,
+    'monthly': TruncMonth,
+    'yearly': TruncYear,
+}
+
+
+def to_money(value):
+    return Decimal(str(value or 0)).quantize(Decimal('0.01'))
+
+
+def budgets_for(expense):
+    return Budget.objects.filter(
+        Q(category__isnull=True) | Q(category_id=expense.category_id),
+        user_id=expense.user_id,
+        currency=expense.currency,
+    )
+
+
+def apply_expense(expense, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) one expense from the running totals of
+    the budgets it counts towards. This touches one BudgetPeriod row per
+    matching budget, however many expenses the period already holds.
+    Returns the budgets whose alert threshold was crossed by this change.
+    """
+    return apply_changes([(expense, sign)])
+
+
+def replace_expense(before, after):
+    """Move an updated expense from its old values to its new ones"""
+    return apply_changes([(before, -1), (after, 1)])
+
+
+def apply_changes(changes):
+    """
+    Apply several (expense, sign) changes at once. The amounts are netted
+    per budget period first, so a period whose total doesn't change isn't
+    written, and an alert only fires when the net change crosses the
+    threshold from below. Returns the budgets whose alert was crossed.
+    """
+    deltas = {}
+    # Budgets per (user, currency, category), so a batch reads each set once
+    matching = {}
+    for expense, sign in changes:
+        if expense.transaction_type != 'debit':
+            continue
+        amount = to_money(expense.total) * sign
+        day = timezone.localdate(expense.created_at)
+        key = (expense.user_id, expense.currency, expense.category_id)
+        if key not in matching:
+            matching[key] = list(budgets_for(expense))
+        for budget in matching[key]:
+            key = (budget.pk, budget.period_start(day))
+            _, delta = deltas.get(key, (budget, Decimal('0.00')))
+            deltas[key] = (budget, delta + amount)
+
+    alerts = []
+    with transaction.atomic():
+        # Lock the periods in key order, so concurrent updates can't deadlock
+        for (_, start), (budget, delta) in sorted(deltas.items(), key=lambda item: item[0]):
+            if not delta:
+                continue
+            period, _ = BudgetPeriod.objects.select_for_update().get_or_create(
+                budget=budget,
+                period_start=start,
+            )
+            previous = period.spent
+            period.spent = previous + delta
+            period.save(update_fields=['spent'])
+
+            if previous < budget.alert_amount <= period.spent:
+                alerts.append(budget_status(budget, period.spent, period.period_start))
+
+    return alerts
+
+
+def budget_status(budget, spent, period_start):
+    spent = to_money(spent)
+    return {
+        'id': budget.id,
+        'name': budget.name,
+        'category': budget.category_id,
+        'currency': budget.currency,
+        'period': budget.period,
+        'period_start': period_start,
+        'period_end': budget.period_end(period_start),
+        'limit': budget.limit,
+        'spent': spent,
+        'remaining': budget.limit - spent,
+        'alert_threshold': budget.alert_threshold,
+        'alert': spent >= budget.alert_amount,
+        'exceeded': spent > budget.limit,
+    }
+
+
+def current_statuses(budgets, today=None):
+    """Status of each budget for the period containing `today`, read in one query"""
+    today = today or timezone.localdate()
+    budgets = list(budgets)
+    if not budgets:
+        return []
+
+    starts = {budget.pk: budget.period_start(today) for budget in budgets}
+    lookup = Q()
+    for budget_id, start in starts.items():
+        lookup |= Q(budget_id=budget_id, period_start=start)
+    spent = dict(
+        ((budget_id, start), value)
+        for budget_id, start, value in BudgetPeriod.objects.filter(lookup).values_list('budget_id', 'period_start', 'spent')
+    )
+
+    return [
+        budget_status(budget, spent.get((budget.pk, starts[budget.pk]), 0), starts[budget.pk])
+        for budget in budgets
+    ]
+
+
+def period_bounds(budget, start):
+    """The [start, end) datetimes of the budget period beginning on `start`"""
+    end = budget.period_end(start) + timedelta(days=1)
+    return (
+        timezone.make_aware(datetime.combine(start, time.min)),
+        timezone.make_aware(datetime.combine(end, time.min)),
+    )
+
+
+def recompute_budget(budget, dry_run=False, period_starts=None):
+    """
+    Re-sum every period of one budget from ExpenseIncome in a single grouped
+    query and fix the stored totals that drifted. With `period_starts`, only
+    the periods beginning on those days are re-summed. Returns the number of
+    periods that were wrong.
+
+    Each record's total is rounded to the cent before it is added, as
+    apply_expense() does, so a correct running total is never reported as
+    drifted. Rows are grouped on the columns the total is computed from, so
+    the query returns one row per distinct amount rather than per record.
+    """
+    expenses = ExpenseIncome.objects.filter(
+        user_id=budget.user_id,
+        transaction_type='debit',
+        currency=budget.currency,
+    )
+    if budget.category_id is not None:
+        expenses = expenses.filter(category_id=budget.category_id)
+    stored = budget.periods.all()
+
+    if period_starts is not None:
+        period_starts = set(period_starts)
+        if not period_starts:
+            return 0
+        in_periods = Q()
+        for start in period_starts:
+            after, before = period_bounds(budget, start)
+            in_periods |= Q(created_at__gte=after, created_at__lt=before)
+        expenses = expenses.filter(in_periods)
+        stored = stored.filter(period_start__in=period_starts)
+
+    truncate = PERIOD_TRUNCATE[budget.period]
+    rows = expenses.annotate(start=truncate('created_at')).values('start', 'amount', 'tax', 'tax_type').annotate(
+        count=Count('id')
+    ).order_by()
+    actual = {}
+    for row in rows:
+        start = timezone.localdate(row['start'])
+        total = to_money(ExpenseIncome.compute_total(row['amount'], row['tax'], row['tax_type']))
+        actual[start] = actual.get(start, Decimal('0.00')) + total * row['count']
+    stored = {period.period_start: period for period in stored}
+
+    to_create = []
+    to_update = []
+    for start, spent in actual.items():
+        period = stored.pop(start, None)
+        if period is None:
+            to_create.append(BudgetPeriod(budget=budget, period_start=start, spent=spent))
+        elif period.spent != spent:
+            period.spent = spent
+            to_update.append(period)
+    # Periods with a stored total but no matching expenses left
+    for period in stored.values():
+        if period.spent != 0:
+            period.spent = Decimal('0.00')
+            to_update.append(period)
+
+    if not dry_run:
+        with transaction.atomic():
+            BudgetPeriod.objects.bulk_create(to_create)
+            BudgetPeriod.objects.bulk_update(to_update, ['spent'])
+
+    return len(to_create) + len(to_update)
+
+
+def recompute_record_periods(records):
+    """
+    Recompute the budget periods the given records fall in, after bulk
+    changes that bypass apply_expense(). `records` holds (user_id, currency,
+    category_id, created_at) tuples of the records before and after the
+    change; periods no record falls in are left alone.
+    """
+    days = {
+        (user_id, currency, category_id, timezone.localdate(created_at))
+        for user_id, currency, category_id, created_at in records
+    }
+    user_ids = {user_id for user_id, _, _, _ in days}
+    for budget in Budget.objects.filter(user_id__in=user_ids).order_by('pk').iterator(chunk_size=500):
+        starts = {
+            budget.period_start(day)
+            for user_id, currency, category_id, day in days
+            if user_id == budget.user_id
+            and currency == budget.currency
+            and budget.category_id in (None, category_id)
+        }
+        recompute_budget(budget, period_starts=starts)
@@ -0,0 +1,102 @@
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.status import HTTP_400_BAD_REQUEST, HTTP_409_CONFLICT, HTTP_422_UNPROCESSABLE_ENTITY
+
+from .models import IdempotencyKey
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    raw = f"{request.method}\n{request.path}\n{body}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def replay(record):
+    response = Response(record.response_body, status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def stored_response(record, fingerprint):
+    if record.fingerprint != fingerprint:
+        return JsonResponse({'error': 'Idempotency-Key was already used for a different request'}, status=HTTP_422_UNPROCESSABLE_ENTITY)
+    return replay(record)
+
+
+def idempotent(view):
+    """
+    Honour the Idempotency-Key header on a write view.
+
+    The first request with a key runs the view and stores its response for
+    settings.IDEMPOTENCY_KEY_TTL. Retries with the same key get that
+    response back from a single indexed lookup, without validating or
+    writing anything again. Reusing a key for a different request is
+    rejected with 422. Server errors are not stored so they can be retried.
+    Goes directly above the view function, under @api_view.
+
+    The key is inserted, the view run and its response stored in one
+    transaction, so a key is either recorded with its response or absent:
+    a worker dying halfway leaves nothing behind that blocks the retry. A
+    concurrent request with the same key waits on the key's unique index
+    and then replays the response; where the database can't tell yet, it
+    gets 409.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > 255:
+            return JsonResponse({'error': 'Idempotency-Key must be at most 255 characters'}, status=HTTP_400_BAD_REQUEST)
+
+        fingerprint = request_fingerprint(request)
+        now = timezone.now()
+
+        with transaction.atomic():
+            record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+            # Rows without a response were left pending by older versions
+            if record is not None and (record.expires_at <= now or record.status_code is None):
+                record.delete()
+                record = None
+            if record is not None:
+                return stored_response(record, fingerprint)
+
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        user=request.user,
+                        key=key,
+                        fingerprint=fingerprint,
+                        expires_at=now + settings.IDEMPOTENCY_KEY_TTL,
+                    )
+            except IntegrityError:
+                # a concurrent request with the same key committed first
+                record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+                if record is None or record.status_code is None:
+                    return JsonResponse({'error': 'A request with this Idempotency-Key is already in progress'}, status=HTTP_409_CONFLICT)
+                return stored_response(record, fingerprint)
+
+            # An exception rolls back the key together with the view's writes
+            response = view(request, *args, **kwargs)
+
+            if response.status_code >= 500:
+                record.delete()
+                return response
+
+            if isinstance(response, Response):
+                body = response.data
+            else:
+                body = json.loads(response.content) if response.content else None
+            record.status_code = response.status_code
+            record.response_body = body
+            record.save(update_fields=['status_code', 'response_body'])
+        return response
+
+    return wrapper
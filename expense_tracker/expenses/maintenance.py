@@ -0,0 +1,213 @@
+import json
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from .batching import pk_ranges, rows_in_range
+from .models import MaintenanceCheckpoint
+
+
+class MaintenanceJob:
+    """
+    A task run over every row of a table, one primary key chunk at a time.
+
+    Subclasses set `name` and implement get_queryset() and process(rows).
+    process() gets the streamed rows of one chunk and returns the primary
+    keys it affected (fixed, found invalid, ...). A chunk can be processed
+    again when an interrupted run resumes, so process() must be safe to
+    repeat. Jobs are pickled to worker processes: keep their state to the
+    options passed to __init__.
+    """
+    name = None
+    # Jobs that only report set this to False; they get no --dry-run
+    writes = True
+
+    def __init__(self, dry_run=False, **options):
+        self.dry_run = dry_run
+        self.options = options
+
+    @property
+    def checkpoint_key(self):
+        # Runs with different options have separate checkpoints
+        options = json.dumps({'dry_run': self.dry_run, **self.options}, sort_keys=True, default=str)
+        return f"{self.name}:{options}"
+
+    def get_queryset(self):
+        raise NotImplementedError('.get_queryset() must be overridden')
+
+    def process(self, rows):
+        raise NotImplementedError('.process() must be overridden')
+
+
+def process_chunk(job, after, upto):
+    """Run `job` over the rows after < pk <= upto; returns (rows seen, affected pks)"""
+    seen = 0
+
+    def counted(rows):
+        nonlocal seen
+        for row in rows:
+            seen += 1
+            yield row
+
+    affected = list(job.process(counted(rows_in_range(job.get_queryset(), after, upto))))
+    return seen, affected
+
+
+class JobRun:
+    """
+    Progress of one run. Chunks may finish out of order when run in
+    parallel; the checkpoint only advances over the chunks that are done
+    without a gap before them, so resuming never skips rows.
+    """
+
+    def __init__(self, checkpoint, sample_size=20):
+        self.checkpoint = checkpoint
+        self.resumed_from = checkpoint.last_pk
+        self.finished = {}
+        self.rows = 0
+        self.affected = 0
+        self.sample = []
+        self.sample_size = sample_size
+        self.started = time.monotonic()
+
+    @property
+    def rows_per_second(self):
+        return self.rows / max(time.monotonic() - self.started, 1e-9)
+
+    def complete(self, after, upto, rows, affected):
+        self.rows += rows
+        self.affected += len(affected)
+        self.sample.extend(affected[:self.sample_size - len(self.sample)])
+        self.finished[after] = (upto, rows, len(affected))
+
+        checkpoint = self.checkpoint
+        advanced = False
+        while checkpoint.last_pk in self.finished:
+            upto, rows, affected = self.finished.pop(checkpoint.last_pk)
+            checkpoint.last_pk = upto
+            checkpoint.rows += rows
+            checkpoint.affected += affected
+            advanced = True
+        if advanced:
+            checkpoint.save(update_fields=['last_pk', 'rows', 'affected', 'updated_at'])
+
+
+def run_job(job, chunk_size=1000, workers=1, restart=False, on_progress=None):
+    """
+    Run `job` over its whole queryset and return the JobRun.
+
+    An unfinished earlier run with the same options is resumed from its
+    checkpoint unless `restart` is set. With workers > 1 chunks are
+    processed in that many spawned processes; at most two chunks per worker
+    are queued, so memory stays constant however large the table is.
+    `on_progress(run)` is called after every chunk.
+    """
+    checkpoint, _ = MaintenanceCheckpoint.objects.get_or_create(job=job.checkpoint_key)
+    if restart or checkpoint.finished_at:
+        checkpoint.last_pk = 0
+        checkpoint.rows = 0
+        checkpoint.affected = 0
+        checkpoint.started_at = timezone.now()
+        checkpoint.finished_at = None
+        checkpoint.save()
+
+    run = JobRun(checkpoint)
+    ranges = pk_ranges(job.get_queryset(), chunk_size, start_after=checkpoint.last_pk)
+
+    def complete(after, upto, result):
+        run.complete(after, upto, *result)
+        if on_progress:
+            on_progress(run)
+
+    if workers <= 1:
+        for after, upto in ranges:
+            complete(after, upto, process_chunk(job, after, upto))
+    else:
+        # Workers open their own connections; don't hand them ours
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        ) as pool:
+            pending = {}
+
+            def collect():
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    complete(*pending.pop(future), future.result())
+
+            for after, upto in ranges:
+                pending[pool.submit(process_chunk, job, after, upto)] = (after, upto)
+                if len(pending) >= workers * 2:
+                    collect()
+            while pending:
+                collect()
+
+    checkpoint.finished_at = timezone.now()
+    checkpoint.save(update_fields=['finished_at', 'updated_at'])
+    return run
+
+
+class MaintenanceCommand(BaseCommand):
+    """
+    Base for management commands that run a MaintenanceJob. Subclasses set
+    `job_class` and `summary`, and override add_job_arguments() and
+    get_job() for options of their own.
+    """
+    job_class = None
+    # Formatted with the run's rows, affected and seconds
+    summary = "Processed {rows} rows, {affected} affected"
+    # Seconds between progress lines
+    progress_interval = 10
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per primary key chunk')
+        parser.add_argument('--workers', type=int, default=1, help='Processes to run chunks in parallel')
+        parser.add_argument('--restart', action='store_true', help='Start over instead of resuming an interrupted run')
+        if self.job_class.writes:
+            parser.add_argument('--dry-run', action='store_true', help='Report without changing anything')
+        self.add_job_arguments(parser)
+
+    def add_job_arguments(self, parser):
+        pass
+
+    def get_job(self, options):
+        return self.job_class(dry_run=options.get('dry_run', False))
+
+    def handle(self, *args, **options):
+        job = self.get_job(options)
+        last_report = time.monotonic()
+
+        def on_progress(run):
+            nonlocal last_report
+            if time.monotonic() - last_report >= self.progress_interval:
+                last_report = time.monotonic()
+                self.stdout.write(
+                    f"{run.rows} rows ({run.rows_per_second:.0f} rows/s), "
+                    f"{run.affected} affected, done up to pk {run.checkpoint.last_pk}"
+                )
+
+        run = run_job(
+            job,
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            restart=options['restart'],
+            on_progress=on_progress,
+        )
+
+        if run.resumed_from:
+            self.stdout.write(f"Resumed an interrupted run after pk {run.resumed_from}")
+        if run.sample:
+            more = ', ...' if run.affected > len(run.sample) else ''
+            self.stdout.write(f"Affected primary keys: {', '.join(map(str, run.sample))}{more}")
+        seconds = time.monotonic() - run.started
+        self.stdout.write(self.style.SUCCESS(
+            self.summary.format(rows=run.rows, affected=run.affected, seconds=seconds)
+            + f" in {seconds:.1f}s ({run.rows_per_second:.0f} rows/s)"
+        ))
@@ -0,0 +1,124 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from statistics import median
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from expenses.models import ExpenseIncome
+from expenses.purge import purge_user
+
+
+BENCHMARK_USERNAME = 'admin-benchmark'
+
+
+class BaselineExpenseIncomeAdmin(admin.ModelAdmin):
+    # The ExpenseIncome admin as it was before the changelist was tuned
+    list_display = ['title', 'user', 'amount', 'transaction_type', 'tax', 'tax_type', 'total', 'created_at']
+    list_filter = ['transaction_type', 'tax_type', 'created_at', 'user']
+    search_fields = ['title', 'description', 'user__username']
+    readonly_fields = ['created_at', 'updated_at']
+    ordering = ['-created_at']
+
+    def total(self, obj):
+        return obj.total
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a large ExpenseIncome table and time the admin changelist, "
+        "and change form, comparing ExpenseIncomeAdmin with its untuned baseline. "
+        "Seeded rows belong to the 'admin-benchmark' user; run against a "
+        "development database only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Rows to seed (existing benchmark rows are reused)')
+        parser.add_argument('--users', type=int, default=50, help='Extra users to spread the rows across')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded users and rows afterwards')
+
+    def handle(self, *args, **options):
+        superuser, users = self.seed_users(options['users'])
+        self.seed_rows(users, options['rows'])
+
+        tuned = admin.site._registry[ExpenseIncome]
+        baseline = BaselineExpenseIncomeAdmin(ExpenseIncome, admin.site)
+        last_page = str(max(options['rows'] // tuned.list_per_page, 1))
+        record = ExpenseIncome.objects.filter(user__username__startswith=BENCHMARK_USERNAME).first()
+        views = [
+            ('changelist p1', lambda model_admin, request: model_admin.changelist_view(request), {'p': '1'}),
+            (f'changelist p{last_page}', lambda model_admin, request: model_admin.changelist_view(request), {'p': last_page}),
+            ('change form', lambda model_admin, request: model_admin.change_view(request, str(record.pk)), {}),
+        ]
+
+        for label, model_admin in (('baseline', baseline), ('tuned', tuned)):
+            for view_label, view, params in views:
+                timings, queries = self.time_view(model_admin, view, superuser, params, options['repeat'])
+                self.stdout.write(
+                    f"{label:9} {view_label:18}: median {median(timings) * 1000:8.1f} ms, "
+                    f"best {min(timings) * 1000:8.1f} ms, {queries} queries"
+                )
+
+        if options['cleanup']:
+            # Chunked like an account deletion in the admin, not one cascading transaction
+            for user_id in User.objects.filter(username__startswith=BENCHMARK_USERNAME).values_list('pk', flat=True):
+                purge_user(user_id)
+            self.stdout.write('Removed benchmark data')
+
+    def seed_users(self, count):
+        superuser, _ = User.objects.get_or_create(
+            username=BENCHMARK_USERNAME,
+            defaults={'is_superuser': True, 'is_staff': True, 'email': 'benchmark@example.com'},
+        )
+        users = [superuser]
+        for i in range(count):
+            user, _ = User.objects.get_or_create(username=f'{BENCHMARK_USERNAME}-{i}')
+            users.append(user)
+        return superuser, users
+
+    def seed_rows(self, users, rows):
+        existing = ExpenseIncome.objects.filter(user__username__startswith=BENCHMARK_USERNAME).count()
+        missing = rows - existing
+        now = timezone.now()
+        batch = []
+        for i in range(max(missing, 0)):
+            batch.append(ExpenseIncome(
+                user=random.choice(users),
+                title=f'Benchmark record {existing + i}',
+                description='x' * 200,
+                amount=Decimal(random.randint(100, 100000)) / 100,
+                transaction_type=random.choice(['credit', 'debit']),
+                tax=Decimal(random.randint(0, 20)),
+                tax_type=random.choice(['flat', 'percentage']),
+                # Spread over three years so the date hierarchy sees realistic data
+                created_at=now - timedelta(minutes=random.randint(0, 3 * 365 * 24 * 60)),
+            ))
+            if len(batch) >= 5000:
+                ExpenseIncome.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            ExpenseIncome.objects.bulk_create(batch)
+        self.stdout.write(f"Benchmark table has {ExpenseIncome.objects.count()} rows")
+
+    def time_view(self, model_admin, view, user, params, repeat):
+        factory = RequestFactory()
+        timings = []
+        queries = 0
+        for _ in range(repeat):
+            request = factory.get('/admin/expenses/expenseincome/', params)
+            request.user = user
+            reset_queries()
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                view(model_admin, request).render()
+                timings.append(time.perf_counter() - start)
+            queries = len(captured)
+        return timings, queries
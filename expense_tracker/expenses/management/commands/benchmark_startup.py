@@ -0,0 +1,124 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Run in a fresh interpreter for every measurement so nothing is imported yet.
+# Prints boot time and the master's RSS, then forks one "worker" that serves
+# every route's view (imports them if they weren't preloaded) and reports how
+# much memory it does not share with the master.
+PROBE = r'''
+import gc, json, os, sys, time
+
+start = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+if os.environ.get('DJANGO_PRELOAD'):
+    from expense_tracker.lazy import preload_views
+    preload_views()
+    gc.freeze()
+boot = time.perf_counter() - start
+
+
+def memory_kb():
+    values = {}
+    try:
+        with open('/proc/self/smaps_rollup') as smaps:
+            for line in smaps:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    values[parts[0].rstrip(':')] = int(parts[1])
+    except OSError:
+        import resource
+        values['Rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return values
+
+
+master = memory_kb()
+read_end, write_end = os.pipe()
+pid = os.fork()
+if pid == 0:
+    os.close(read_end)
+    from expense_tracker.lazy import preload_views
+    start = time.perf_counter()
+    preload_views()
+    first_request = time.perf_counter() - start
+    worker = memory_kb()
+    private = worker.get('Private_Clean', 0) + worker.get('Private_Dirty', 0)
+    os.write(write_end, json.dumps({
+        'first_request': first_request,
+        'worker_private_kb': private or worker.get('Rss'),
+    }).encode())
+    os._exit(0)
+
+os.close(write_end)
+with os.fdopen(read_end) as pipe:
+    child = json.loads(pipe.read())
+os.waitpid(pid, 0)
+
+print(json.dumps({
+    'boot': boot,
+    'modules': len(sys.modules),
+    'master_rss_kb': master.get('Rss'),
+    **child,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare cold start time and per-worker memory of the full settings "
+        "and the API-only profile, with views imported lazily in each worker "
+        "or preloaded in the master before forking"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per configuration; the median is reported')
+        parser.add_argument(
+            '--settings-modules',
+            nargs='+',
+            default=['expense_tracker.settings', 'expense_tracker.settings_api'],
+        )
+
+    def handle(self, *args, **options):
+        if not hasattr(os, 'fork'):
+            raise CommandError("The startup benchmark needs os.fork()")
+
+        self.stdout.write(
+            f"{'settings':<30} {'views':<8} {'boot ms':>8} {'modules':>8} "
+            f"{'master MB':>10} {'1st req ms':>11} {'worker MB':>10}"
+        )
+        for settings_module in options['settings_modules']:
+            for preload in (False, True):
+                runs = [self.probe(settings_module, preload) for _ in range(options['repeat'])]
+                runs.sort(key=lambda run: run['boot'])
+                run = runs[len(runs) // 2]
+                self.stdout.write(
+                    f"{settings_module:<30} {'preload' if preload else 'lazy':<8} "
+                    f"{run['boot'] * 1000:>8.1f} {run['modules']:>8} "
+                    f"{run['master_rss_kb'] / 1024:>10.1f} {run['first_request'] * 1000:>11.1f} "
+                    f"{run['worker_private_kb'] / 1024:>10.1f}"
+                )
+
+    def probe(self, settings_module, preload):
+        env = {key: value for key, value in os.environ.items() if key != 'DJANGO_PRELOAD'}
+        env['DJANGO_SETTINGS_MODULE'] = settings_module
+        env['PYTHONWARNINGS'] = 'ignore'
+        if preload:
+            env['DJANGO_PRELOAD'] = '1'
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Probe for {settings_module} failed:\n{result.stderr}")
+        return json.loads(result.stdout.strip().splitlines()[-1])
@@ -0,0 +1,58 @@
+import csv
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.models import ExchangeRate
+
+
+class Command(BaseCommand):
+    help = (
+        "Load exchange rates from a CSV file with the columns date,currency,rate. "
+        "Each rate is the value of one unit of the currency in BASE_CURRENCY. "
+        "Existing (currency, date) rows are updated."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to load')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        batch = []
+        loaded = 0
+
+        try:
+            with open(options['path'], newline='') as rates_file:
+                for line_number, row in enumerate(csv.DictReader(rates_file), start=2):
+                    batch.append(self.parse_row(row, line_number))
+                    if len(batch) >= batch_size:
+                        loaded += self.save(batch)
+                        batch = []
+        except OSError as e:
+            raise CommandError(f"Could not read {options['path']}: {e}")
+
+        if batch:
+            loaded += self.save(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Loaded {loaded} exchange rates"))
+
+    def parse_row(self, row, line_number):
+        try:
+            return ExchangeRate(
+                currency=row['currency'].strip().upper(),
+                date=date.fromisoformat(row['date'].strip()),
+                rate=Decimal(row['rate'].strip()),
+            )
+        except (KeyError, AttributeError, ValueError, InvalidOperation):
+            raise CommandError(f"Invalid exchange rate on line {line_number}: {row}")
+
+    def save(self, batch):
+        ExchangeRate.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=['currency', 'date'],
+            update_fields=['rate'],
+        )
+        return len(batch)
@@ -0,0 +1,35 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.recurring import materialize_due_rules
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the ExpenseIncome rows for every recurring rule that is due. "
+        "Safe to run repeatedly, e.g. from cron once a day. The new rows are added "
+        "to their owners' balances and budgets; budgets they push over their alert "
+        "threshold are listed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Materialize occurrences up to this day (YYYY-MM-DD), defaults to today')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date must be in YYYY-MM-DD format')
+
+        def on_alert(status):
+            self.stdout.write(self.style.WARNING(
+                f"Budget {status['id']} ({status['name']}) reached "
+                f"{status['spent']} of {status['limit']} {status['currency']}"
+            ))
+
+        rules, rows = materialize_due_rules(today=today, batch_size=options['batch_size'], on_alert=on_alert)
+        self.stdout.write(self.style.SUCCESS(f"Processed {rules} recurring rules and {rows} occurrences"))
@@ -0,0 +1,40 @@
+from django.db import transaction
+
+from expenses import audit
+from expenses.maintenance import MaintenanceCommand, MaintenanceJob
+from expenses.models import ExpenseIncome
+
+
+class CurrencyJob(MaintenanceJob):
+    name = 'normalize_currencies'
+
+    def get_queryset(self):
+        return ExpenseIncome.all_objects.only('pk', 'currency')
+
+    def process(self, rows):
+        changed = []
+        for expense in rows:
+            currency = expense.currency.strip().upper()
+            if currency != expense.currency:
+                changed.append((expense, expense.currency))
+                expense.currency = currency
+        if changed and not self.dry_run:
+            with transaction.atomic():
+                ExpenseIncome.all_objects.bulk_update([expense for expense, _ in changed], ['currency'])
+                audit.log_changes([
+                    (expense.pk, 'update', {'currency': [old, expense.currency]}, None)
+                    for expense, old in changed
+                ])
+            # Workers exit when the run ends; don't leave entries in their buffers
+            audit.buffer.flush()
+        return [expense.pk for expense, _ in changed]
+
+
+class Command(MaintenanceCommand):
+    help = (
+        "Store every currency code upper case without surrounding spaces, as "
+        "the API does, for records written before it validated codes. Run "
+        "verify_balances and reconcile_budgets afterwards if any were changed."
+    )
+    job_class = CurrencyJob
+    summary = "Checked {rows} records, {affected} currency codes normalized"
@@ -0,0 +1,39 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from expenses.purge import purge_deleted, purge_user
+
+
+class Command(BaseCommand):
+    help = (
+        "Hard-delete soft-deleted expense/income records once SOFT_DELETE_RETENTION "
+        "has passed, in short per-chunk transactions. Safe to run repeatedly "
+        "(e.g. from cron). With --account, deletes a whole user account the same way."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, help='Override SOFT_DELETE_RETENTION')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--account', type=int, metavar='USER_ID', help='Delete this user and all their data')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        start = time.perf_counter()
+
+        if options['account']:
+            if not User.objects.filter(pk=options['account']).exists():
+                raise CommandError(f"User {options['account']} does not exist")
+            deleted = purge_user(options['account'], chunk_size)
+            message = f"Deleted user {options['account']} and {deleted} records"
+        else:
+            before = None
+            if options['older_than_days'] is not None:
+                before = timezone.now() - timedelta(days=options['older_than_days'])
+            deleted = purge_deleted(before, chunk_size)
+            message = f"Purged {deleted} deleted records"
+
+        self.stdout.write(self.style.SUCCESS(f"{message} in {time.perf_counter() - start:.1f}s"))
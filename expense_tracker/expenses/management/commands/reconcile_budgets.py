@@ -0,0 +1,31 @@
+from expenses.budgets import recompute_budget
+from expenses.maintenance import MaintenanceCommand, MaintenanceJob
+from expenses.models import Budget
+
+
+class BudgetJob(MaintenanceJob):
+    name = 'reconcile_budgets'
+
+    def get_queryset(self):
+        budgets = Budget.objects.all()
+        if self.options.get('user'):
+            budgets = budgets.filter(user_id=self.options['user'])
+        return budgets
+
+    def process(self, rows):
+        return [budget.pk for budget in rows if recompute_budget(budget, dry_run=self.dry_run)]
+
+
+class Command(MaintenanceCommand):
+    help = (
+        "Recompute budget running totals from ExpenseIncome and fix any that "
+        "drifted, e.g. after bulk imports or recurring rows written outside the API."
+    )
+    job_class = BudgetJob
+    summary = "Checked {rows} budgets, {affected} had drifted"
+
+    def add_job_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only reconcile budgets of this user id')
+
+    def get_job(self, options):
+        return BudgetJob(dry_run=options['dry_run'], user=options['user'])
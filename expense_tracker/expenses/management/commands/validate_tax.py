@@ -0,0 +1,34 @@
+from decimal import Decimal
+
+from expenses.maintenance import MaintenanceCommand, MaintenanceJob
+from expenses.models import ExpenseIncome
+
+
+TAX_TYPES = {value for value, _ in ExpenseIncome.TAX_TYPES}
+
+
+def tax_is_valid(tax, tax_type):
+    if tax_type not in TAX_TYPES or tax is None or tax < 0:
+        return False
+    return tax_type != 'percentage' or tax <= Decimal('100')
+
+
+class TaxJob(MaintenanceJob):
+    name = 'validate_tax'
+    writes = False
+
+    def get_queryset(self):
+        return ExpenseIncome.all_objects.only('pk', 'tax', 'tax_type')
+
+    def process(self, rows):
+        return [expense.pk for expense in rows if not tax_is_valid(expense.tax, expense.tax_type)]
+
+
+class Command(MaintenanceCommand):
+    help = (
+        "Re-validate the tax settings of every expense/income record, deleted "
+        "ones included: tax_type must be a known type, tax can't be negative and "
+        "a percentage can't be over 100. Invalid records are listed, not changed."
+    )
+    job_class = TaxJob
+    summary = "Checked {rows} records, {affected} with invalid tax settings"
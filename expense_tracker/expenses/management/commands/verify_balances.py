@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+
+from expenses.balances import recompute_balances
+from expenses.maintenance import MaintenanceCommand, MaintenanceJob
+
+
+class BalanceJob(MaintenanceJob):
+    name = 'verify_balances'
+
+    def get_queryset(self):
+        users = User.objects.only('pk')
+        if self.options.get('user'):
+            users = users.filter(pk=self.options['user'])
+        return users
+
+    def process(self, rows):
+        # One query over the chunk's records and one bulk write per chunk of users
+        return recompute_balances([user.pk for user in rows], dry_run=self.dry_run)
+
+
+class Command(MaintenanceCommand):
+    help = (
+        "Check stored user balances against ExpenseIncome and repair the ones "
+        "that drifted or are missing, a chunk of users at a time."
+    )
+    job_class = BalanceJob
+    summary = "Checked {rows} balances, {affected} had drifted"
+
+    def add_job_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only verify the balance of this user id')
+
+    def get_job(self, options):
+        return BalanceJob(dry_run=options['dry_run'], user=options['user'])
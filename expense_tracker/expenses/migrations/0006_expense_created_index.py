@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0005_budgets'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expenseincome',
+            index=models.Index(fields=['-created_at'], name='expense_created_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0008_user_balances'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='expenseincome',
+            name='expense_user_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='expenseincome',
+            name='expense_user_category_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='expenseincome',
+            name='expense_created_idx',
+        ),
+        migrations.AddField(
+            model_name='expenseincome',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='expenseincome',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['user', '-created_at'], name='expense_live_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expenseincome',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['-created_at'], name='expense_live_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expenseincome',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['user', 'category'], name='expense_live_user_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expenseincome',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='expense_deleted_idx'),
+        ),
+    ]
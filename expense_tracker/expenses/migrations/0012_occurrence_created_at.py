@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:39
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0011_maintenance_checkpoints'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='expenseincome',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
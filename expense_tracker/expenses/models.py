@@ -1,6 +1,135 @@
 from django.db import models
+from django.db.models import Case, When, Value, F, Q, OuterRef, Subquery, Exists, ExpressionWrapper
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth.models import User
+from django.utils import timezone
 from decimal import Decimal
+from datetime import date, datetime, time, timedelta
+from calendar import monthrange
+
+
+MONEY_FIELD = models.DecimalField(max_digits=20, decimal_places=2)
+RATE_FIELD = models.DecimalField(max_digits=20, decimal_places=8)
+
+
+class ExchangeRate(models.Model):
+    """Value of one unit of `currency` in settings.BASE_CURRENCY on a given date"""
+    currency = models.CharField(max_length=3)
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=20, decimal_places=8)
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['currency', 'date'], name='unique_rate_per_currency_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.currency} {self.rate} ({self.date})"
+
+
+def total_expression():
+    # SQL version of ExpenseIncome.total
+    return Case(
+        # multiply by 0.01 rather than divide by 100 so SQLite doesn't fall
+        # back to integer division for whole-number amounts
+        When(tax_type='percentage', then=F('amount') + F('amount') * F('tax') * Value(Decimal('0.01'))),
+        default=F('amount') + F('tax'),
+        output_field=MONEY_FIELD,
+    )
+
+
+def rate_to_base(currency=None):
+    """
+    Rate into the base currency on each row's date, taken from the most
+    recent published rate on or before that day. Without `currency` the
+    row's own currency is used.
+    """
+    code = OuterRef('currency') if currency is None else currency
+    latest_rate = ExchangeRate.objects.filter(
+        currency=code,
+        date__lte=OuterRef('created_at__date'),
+    ).order_by('-date').values('rate')[:1]
+
+    if currency is None:
+        return Case(
+            When(currency=settings.BASE_CURRENCY, then=Value(Decimal('1'))),
+            default=Subquery(latest_rate),
+            output_field=RATE_FIELD,
+        )
+    if currency == settings.BASE_CURRENCY:
+        return Value(Decimal('1'), output_field=RATE_FIELD)
+    return Subquery(latest_rate, output_field=RATE_FIELD)
+
+
+class ExpenseIncomeQuerySet(models.QuerySet):
+    def with_tags(self, tag_ids):
+        """Rows carrying any of `tag_ids`, without the duplicates a join would produce"""
+        tagged = ExpenseIncome.tags.through.objects.filter(
+            expenseincome_id=OuterRef('pk'),
+            tag_id__in=tag_ids,
+        )
+        return self.filter(Exists(tagged))
+
+    def with_total(self):
+        """Annotate `db_total`, the same value as ExpenseIncome.total computed in SQL"""
+        return self.annotate(db_total=total_expression())
+
+    def convert_to(self, currency):
+        """
+        Annotate `converted_total` with each row's total in `currency`.
+        Conversion goes through the base currency using the rates in effect
+        on the row's date, all inside the same query. Rows without a
+        matching rate get NULL.
+        """
+        return self.annotate(
+            converted_total=Case(
+                When(currency=currency, then=total_expression()),
+                default=ExpressionWrapper(
+                    total_expression() * rate_to_base() / rate_to_base(currency),
+                    output_field=MONEY_FIELD,
+                ),
+                output_field=MONEY_FIELD,
+            )
+        )
+
+
+class LiveExpenseIncomeManager(models.Manager.from_queryset(ExpenseIncomeQuerySet)):
+    """Default manager of ExpenseIncome; soft-deleted rows are left out"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class Category(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expense_categories')
+    name = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = 'categories'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='unique_category_per_user'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class Tag(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expense_tags')
+    name = models.CharField(max_length=50)
+
+    class Meta:
+        ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='unique_tag_per_user'),
+        ]
+
+    def __str__(self):
+        return self.name
 
 
 class ExpenseIncome(models.Model):
@@ -21,22 +150,335 @@ class ExpenseIncome(models.Model):
     transaction_type = models.CharField(max_length=10, choices=TRANSACTION_TYPES)
     tax = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     tax_type = models.CharField(max_length=15, choices=TAX_TYPES, default='flat')
-    created_at = models.DateTimeField(auto_now_add=True)
+    currency = models.CharField(max_length=3, default='USD')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='expenses')
+    tags = models.ManyToManyField(Tag, blank=True, related_name='expenses')
+    # Set on rows materialized from a RecurringRule
+    recurring_rule = models.ForeignKey('RecurringRule', on_delete=models.SET_NULL, null=True, blank=True, related_name='occurrences')
+    occurrence_date = models.DateField(null=True, blank=True)
+    # Not auto_now_add: recurring occurrences are dated on their occurrence day
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set when the record is deleted; it can be restored until it is purged
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = LiveExpenseIncomeManager()
+    # Includes soft-deleted rows, for restoring and purging
+    all_objects = ExpenseIncomeQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
+        # Every read goes through `objects`, so the indexes only cover live
+        # rows and deleted rows waiting to be purged don't bloat them
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='expense_live_user_created_idx', condition=Q(deleted_at__isnull=True)),
+            # Serves the default ordering and date filtering across all users (admin, superuser lists)
+            models.Index(fields=['-created_at'], name='expense_live_created_idx', condition=Q(deleted_at__isnull=True)),
+            models.Index(fields=['user', 'category'], name='expense_live_user_cat_idx', condition=Q(deleted_at__isnull=True)),
+            # Finds rows due for purging
+            models.Index(fields=['deleted_at'], name='expense_deleted_idx', condition=Q(deleted_at__isnull=False)),
+        ]
+        constraints = [
+            # Makes re-running the recurring scheduler a no-op for occurrences it already wrote
+            models.UniqueConstraint(fields=['recurring_rule', 'occurrence_date'], name='unique_occurrence_per_rule'),
+        ]
     
     def __str__(self):
-        return f"{self.title} - {self.amount} ({self.transaction_type})"
+        return f"{self.title} - {self.amount} {self.currency} ({self.transaction_type})"
+    
+    # Both only change the row if it is still in the state it was read in
+    # and return whether they did, so of two concurrent deletes (or
+    # restores) only one moves the budgets and balance
+    def soft_delete(self):
+        now = timezone.now()
+        deleted = ExpenseIncome.all_objects.filter(pk=self.pk, deleted_at__isnull=True).update(deleted_at=now, updated_at=now)
+        if deleted:
+            self.deleted_at = self.updated_at = now
+        return deleted == 1
+    
+    def restore(self):
+        now = timezone.now()
+        restored = ExpenseIncome.all_objects.filter(pk=self.pk, deleted_at__isnull=False).update(deleted_at=None, updated_at=now)
+        if restored:
+            self.deleted_at = None
+            self.updated_at = now
+        return restored == 1
     
     @property
     def total(self):
         """Calculate total amount including tax"""
-        if self.tax_type == 'percentage':
+        return self.compute_total(self.amount, self.tax, self.tax_type)
+    
+    @staticmethod
+    def compute_total(amount, tax, tax_type):
+        """ExpenseIncome.total for raw column values, e.g. from values_list()"""
+        if tax_type == 'percentage':
             # Percentage tax: Total = Amount + (Amount × Tax ÷ 100)
-            tax_amount = self.amount * (self.tax / Decimal('100'))
-            return self.amount + tax_amount
+            tax_amount = amount * (tax / Decimal('100'))
+            return amount + tax_amount
         else:
             # Flat tax: Total = Amount + Tax
-            return self.amount + self.tax
+            return amount + tax
+
+
+class RecurringRule(models.Model):
+    """
+    Template for a transaction that repeats on an RRULE-like schedule
+    (FREQ, INTERVAL, UNTIL and COUNT). Occurrences are written as normal
+    ExpenseIncome rows by the materialize_recurring command.
+    """
+    FREQUENCIES = [
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+        ('monthly', 'Monthly'),
+        ('yearly', 'Yearly'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_rules')
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True, null=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    transaction_type = models.CharField(max_length=10, choices=ExpenseIncome.TRANSACTION_TYPES)
+    tax = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    tax_type = models.CharField(max_length=15, choices=ExpenseIncome.TAX_TYPES, default='flat')
+    currency = models.CharField(max_length=3, default='USD')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='recurring_rules')
+
+    frequency = models.CharField(max_length=10, choices=FREQUENCIES)
+    interval = models.PositiveIntegerField(default=1)
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    max_occurrences = models.PositiveIntegerField(null=True, blank=True)
+
+    # Scheduler state: how many occurrences exist and when the next one is due
+    occurrences_created = models.PositiveIntegerField(default=0)
+    next_run = models.DateField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['next_run']
+        indexes = [
+            models.Index(fields=['next_run', 'id'], condition=Q(is_active=True), name='recurring_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.frequency}, every {self.interval})"
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.next_run is None:
+            # None when the schedule is empty, e.g. max_occurrences=0
+            self.next_run = self.occurrence(0)
+        super().save(*args, **kwargs)
+
+    def occurrence(self, index):
+        """Date of the index-th occurrence (0 is start_date), or None once the schedule has ended"""
+        if self.max_occurrences is not None and index >= self.max_occurrences:
+            return None
+
+        step = index * self.interval
+        if self.frequency == 'daily':
+            day = self.start_date + timedelta(days=step)
+        elif self.frequency == 'weekly':
+            day = self.start_date + timedelta(weeks=step)
+        else:
+            # Months and years are counted from start_date so a rule starting
+            # on the 31st lands on the last day of shorter months without drifting
+            months = step if self.frequency == 'monthly' else step * 12
+            year, month = divmod(self.start_date.month - 1 + months, 12)
+            year += self.start_date.year
+            month += 1
+            day = date(year, month, min(self.start_date.day, monthrange(year, month)[1]))
+
+        if self.end_date is not None and day > self.end_date:
+            return None
+        return day
+
+    def build_occurrence(self, day):
+        return ExpenseIncome(
+            user_id=self.user_id,
+            title=self.title,
+            description=self.description,
+            amount=self.amount,
+            transaction_type=self.transaction_type,
+            tax=self.tax,
+            tax_type=self.tax_type,
+            currency=self.currency,
+            category_id=self.category_id,
+            recurring_rule=self,
+            occurrence_date=day,
+            # Backfilled occurrences count in the period they belong to
+            created_at=timezone.make_aware(datetime.combine(day, time.min)),
+        )
+
+
+class Budget(models.Model):
+    """
+    Spending limit per period. Only debits in the budget's currency count,
+    limited to one category when `category` is set. Running totals live in
+    BudgetPeriod and are kept up to date by the expense write views.
+    """
+    PERIODS = [
+        ('weekly', 'Weekly'),
+        ('monthly', 'Monthly'),
+        ('yearly', 'Yearly'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='budgets')
+    name = models.CharField(max_length=100)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='budgets')
+    currency = models.CharField(max_length=3, default='USD')
+    period = models.CharField(max_length=10, choices=PERIODS, default='monthly')
+    limit = models.DecimalField(max_digits=12, decimal_places=2)
+    # Percentage of the limit at which the budget is reported as alerting
+    alert_threshold = models.PositiveSmallIntegerField(default=80)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+        indexes = [
+            models.Index(fields=['user', 'currency'], name='budget_user_currency_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.limit} {self.currency} {self.period})"
+
+    def period_start(self, day):
+        """First day of the period containing `day`"""
+        if self.period == 'weekly':
+            return day - timedelta(days=day.weekday())
+        if self.period == 'yearly':
+            return day.replace(month=1, day=1)
+        return day.replace(day=1)
+
+    def period_end(self, day):
+        """Last day of the period containing `day`"""
+        start = self.period_start(day)
+        if self.period == 'weekly':
+            return start + timedelta(days=6)
+        if self.period == 'yearly':
+            return start.replace(month=12, day=31)
+        return start.replace(day=monthrange(start.year, start.month)[1])
+
+    @property
+    def alert_amount(self):
+        return self.limit * self.alert_threshold / Decimal('100')
+
+    def matches(self, expense):
+        return (
+            expense.transaction_type == 'debit'
+            and expense.currency == self.currency
+            and (self.category_id is None or self.category_id == expense.category_id)
+        )
+
+
+class BudgetPeriod(models.Model):
+    """Running total spent against a budget in one period"""
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE, related_name='periods')
+    period_start = models.DateField()
+    spent = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        ordering = ['-period_start']
+        constraints = [
+            models.UniqueConstraint(fields=['budget', 'period_start'], name='unique_budget_period'),
+        ]
+
+    def __str__(self):
+        return f"{self.budget.name} from {self.period_start}: {self.spent}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Response stored for a client supplied Idempotency-Key so a retried
+    write gets the original result instead of running again. The row is
+    committed together with the write and its response; a row without a
+    status_code can only be left over from an older version and is replaced.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    # sha256 of method, path and body, to reject a key reused for a different request
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.user_id})"
+
+
+class Balance(models.Model):
+    """
+    Running credit and debit totals of one user, kept up to date by every
+    write so that reading a balance is a primary key lookup. `totals` maps a
+    currency to {"credit": ..., "debit": ...}. `version` goes up with every
+    change; writers only save over the version they read (optimistic
+    concurrency), see balances.py.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='balance')
+    totals = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Balance of {self.user_id} (v{self.version})"
+
+
+class ExpenseIncomeChange(models.Model):
+    """
+    Append-only log of writes to ExpenseIncome. `changes` maps each field
+    that changed to [old value, new value]; a create holds every field with
+    old value None. Entries are never updated, and outlive soft deletes and
+    purges of the record, so they reference it by id rather than a foreign key.
+    """
+    ACTIONS = [
+        ('create', 'Create'),
+        ('update', 'Update'),
+        ('delete', 'Delete'),
+        ('restore', 'Restore'),
+    ]
+
+    record_id = models.BigIntegerField()
+    # Whoever made the change, which is not always the owner (superusers, admin)
+    actor_id = models.IntegerField(null=True, blank=True)
+    action = models.CharField(max_length=10, choices=ACTIONS)
+    changes = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    # Time of the write, not of the (possibly later) batched insert
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['record_id', 'created_at'], name='expense_change_record_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.action} of {self.record_id} at {self.created_at}"
+
+
+class MaintenanceCheckpoint(models.Model):
+    """
+    Progress of a maintenance job (see maintenance.py): every row with a
+    primary key up to `last_pk` has been processed, so an interrupted run
+    can resume from there.
+    """
+    job = models.CharField(max_length=255, unique=True)
+    last_pk = models.BigIntegerField(default=0)
+    rows = models.BigIntegerField(default=0)
+    affected = models.BigIntegerField(default=0)
+    started_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        state = 'finished' if self.finished_at else f'at pk {self.last_pk}'
+        return f"{self.job} ({state})"
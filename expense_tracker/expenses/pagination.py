@@ -0,0 +1,109 @@
+import base64
+import binascii
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models.sql import Query
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids an exact COUNT(*) over a whole table.
+
+    When the queryset has no filters and the database keeps table
+    statistics (PostgreSQL), the planner's row estimate is used instead,
+    which is read from the catalog in constant time. A queryset filtered
+    only on the condition of one of the model's partial indexes (e.g. the
+    live-row filter of a soft-delete manager) is estimated from that index.
+    Other filtered querysets and other databases fall back to the normal
+    count.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        relation = estimate_relation(queryset.model, query) if query is not None else None
+        if relation is not None:
+            estimate = estimated_row_count(relation, queryset.db)
+            if estimate is not None:
+                return estimate
+        return super().count
+
+
+def estimate_relation(model, query):
+    """
+    The table, or the partial index, whose row count is the count of
+    `query`, or None if there is none.
+    """
+    if not query.where:
+        return model._meta.db_table
+    for index in model._meta.indexes:
+        if index.condition is not None and Query(model).build_where(index.condition) == query.where:
+            return index.name
+    return None
+
+
+def estimated_row_count(relation, using='default'):
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [relation],
+        )
+        row = cursor.fetchone()
+    # reltuples is -1 (or 0) for tables that were never analyzed
+    if row is None or row[0] <= 0:
+        return None
+    return row[0]
+
+
+def encode_cursor(values):
+    """
+    Opaque keyset cursor for the sort key of the last row on a page. Values
+    must be JSON types; pass datetimes and decimals as strings so they keep
+    full precision.
+    """
+    payload = json.dumps(values).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor(); raises ValueError for a malformed cursor"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError, binascii.Error):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def cursor_value(value, kind):
+    """
+    One value of a decoded cursor, checked to be a `kind` (bools don't pass
+    as ints); raises ValueError otherwise, so a forged cursor can't reach
+    the query.
+    """
+    if isinstance(value, bool) or not isinstance(value, kind):
+        raise ValueError('Invalid cursor')
+    return value
+
+
+def keyset_page(queryset, page_size, cursor_of):
+    """
+    Evaluate one keyset page. `queryset` must already be filtered to rows
+    after the incoming cursor and ordered by the sort key; one extra row is
+    fetched to know whether there is a next page. Returns (rows, next cursor).
+    """
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(cursor_of(rows[-1]))
+    return rows, next_cursor
@@ -13,4 +13,13 @@ class IsOwnerOrSuperuser(permissions.BasePermission):
             return True
         
         # only the regular  users can access their own objects
-        return obj.user == request.user 
\ No newline at end of file
+        return obj.user == request.user 
+
+
+class IsSuperuser(permissions.BasePermission):
+    """
+    Only superusers may use the view, e.g. the cross-tenant analytics endpoints.
+    """
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_superuser)
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .models import BudgetPeriod, ExpenseIncome, ExpenseIncomeChange, IdempotencyKey
+
+
+def delete_in_chunks(queryset, chunk_size=1000):
+    """
+    Hard-delete the rows of `queryset` `chunk_size` at a time, walking the
+    primary key. Each chunk is deleted in its own short transaction, so no
+    lock is held for longer than one chunk however many rows match.
+    Returns the number of rows deleted.
+    """
+    model = queryset.model
+    deleted = 0
+    last_pk = 0
+    while True:
+        pks = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return deleted
+        with transaction.atomic():
+            model._base_manager.filter(pk__in=pks).delete()
+        deleted += len(pks)
+        last_pk = pks[-1]
+
+
+def purge_deleted(before=None, chunk_size=1000):
+    """Hard-delete records that were soft deleted before `before` (default: SOFT_DELETE_RETENTION ago)"""
+    before = before or timezone.now() - settings.SOFT_DELETE_RETENTION
+    return delete_in_chunks(ExpenseIncome.all_objects.filter(deleted_at__lt=before), chunk_size)
+
+
+def purge_user(user_id, chunk_size=1000):
+    """
+    Delete an account. Its records, live or deleted, their change log and
+    the other tables that grow with usage are removed chunk by chunk first;
+    the final user.delete() then only cascades over a handful of small rows
+    instead of the whole history in one transaction. Returns the number of
+    records deleted.
+    """
+    records = ExpenseIncome.all_objects.filter(user_id=user_id)
+    delete_in_chunks(ExpenseIncomeChange.objects.filter(record_id__in=records.values('pk')), chunk_size)
+    deleted = delete_in_chunks(records, chunk_size)
+    delete_in_chunks(BudgetPeriod.objects.filter(budget__user_id=user_id), chunk_size)
+    delete_in_chunks(IdempotencyKey.objects.filter(user_id=user_id), chunk_size)
+    User.objects.filter(pk=user_id).delete()
+    return deleted
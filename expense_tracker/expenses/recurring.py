@@ -0,0 +1,99 @@
+from django.db import transaction
+from django.utils import timezone
+
+from . import audit, balances, budgets
+from .models import ExpenseIncome, RecurringRule
+
+
+def materialize_due_rules(today=None, batch_size=500, on_alert=None):
+    """
+    Write every occurrence due on or before `today` for all active rules.
+
+    Rules are taken `batch_size` at a time in (next_run, id) order, the
+    order of the partial due-rule index, so only one batch of rules and at
+    most `batch_size` pending rows are held in memory. A processed rule is
+    moved past `today` (or deactivated), which drops it out of the due
+    query, so the next batch is simply the first one again. The batch is
+    locked while it is processed, so a concurrent run waits for it and then
+    skips the rules it moved on. Occurrences already written by an earlier,
+    interrupted run are left out before the insert, so the command can
+    safely be rerun, and only the rows actually inserted are added to their
+    owners' balances and budgets. `on_alert(status)` is called for every
+    budget whose alert threshold they crossed. Returns (rules processed,
+    occurrences inserted).
+    """
+    today = today or timezone.localdate()
+    due_rules = RecurringRule.objects.filter(is_active=True, next_run__lte=today).order_by('next_run', 'id')
+
+    rules_processed = 0
+    rows_written = 0
+
+    while True:
+        with transaction.atomic():
+            rules = list(due_rules.select_for_update()[:batch_size])
+            if not rules:
+                break
+
+            pending = []
+            # (currency, transaction type) -> amount inserted, per owner
+            totals = {}
+            for rule in rules:
+                while rule.next_run is not None and rule.next_run <= today:
+                    pending.append(rule.build_occurrence(rule.next_run))
+                    rule.occurrences_created += 1
+                    rule.next_run = rule.occurrence(rule.occurrences_created)
+
+                    if len(pending) >= batch_size:
+                        rows_written += _flush(pending, totals, on_alert)
+                        pending = []
+
+                if rule.next_run is None:
+                    rule.is_active = False
+
+            rows_written += _flush(pending, totals, on_alert)
+            RecurringRule.objects.bulk_update(rules, ['occurrences_created', 'next_run', 'is_active'])
+            for user_id, amounts in totals.items():
+                balances.update_balance(user_id, [
+                    (currency, transaction_type, amount)
+                    for (currency, transaction_type), amount in amounts.items()
+                ])
+
+        rules_processed += len(rules)
+
+    return rules_processed, rows_written
+
+
+def _flush(pending, totals, on_alert=None):
+    """
+    Insert the occurrences that don't exist yet, log their creation, add
+    them to their budgets and to the balance `totals`; returns how many
+    were inserted.
+    """
+    if not pending:
+        return 0
+    # Soft-deleted occurrences count too: the rule already produced them
+    existing = set(ExpenseIncome.all_objects.filter(
+        recurring_rule_id__in={occurrence.recurring_rule_id for occurrence in pending},
+        occurrence_date__in={occurrence.occurrence_date for occurrence in pending},
+    ).values_list('recurring_rule_id', 'occurrence_date'))
+    new = [
+        occurrence for occurrence in pending
+        if (occurrence.recurring_rule_id, occurrence.occurrence_date) not in existing
+    ]
+    ExpenseIncome.objects.bulk_create(new)
+    # Created by the scheduler, not by a user
+    audit.log_changes([
+        (occurrence.pk, 'create', audit.diff({}, audit.snapshot(occurrence)), None)
+        for occurrence in new
+    ])
+
+    alerts = budgets.apply_changes([(occurrence, 1) for occurrence in new])
+    if on_alert:
+        for status in alerts:
+            on_alert(status)
+
+    for occurrence in new:
+        currency, transaction_type, amount = balances.change(occurrence)
+        amounts = totals.setdefault(occurrence.user_id, {})
+        amounts[currency, transaction_type] = amounts.get((currency, transaction_type), 0) + amount
+    return len(new)
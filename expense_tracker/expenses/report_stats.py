@@ -0,0 +1,224 @@
+"""
+Statistics for the yearly reports, computed over whole columns at once
+instead of per ExpenseIncome instance.
+
+This module does not import Django so it can run in a spawned worker
+process. NumPy is used when it is installed; otherwise the same results are
+computed in plain Python.
+"""
+import math
+from decimal import Decimal
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+COLUMNS = ('month', 'transaction_type', 'amount', 'tax', 'tax_type', 'currency')
+PERCENTILES = (25, 50, 75, 90, 99)
+TAX_TYPES = ('flat', 'percentage')
+TRANSACTION_TYPES = ('credit', 'debit')
+
+
+def money(value):
+    return Decimal(str(round(float(value), 2))).quantize(Decimal('0.01'))
+
+
+def cents(value):
+    """Exact number of cents in a 2-place Decimal"""
+    return int(Decimal(value).scaleb(2))
+
+
+def from_cents(value):
+    return Decimal(int(value)).scaleb(-2)
+
+
+def round_half_even(numerator, denominator):
+    """numerator / denominator rounded like Decimal.quantize() does, in integers"""
+    quotient, remainder = divmod(numerator, denominator)
+    if remainder * 2 > denominator or (remainder * 2 == denominator and quotient % 2):
+        quotient += 1
+    return quotient
+
+
+def build_report(columns, window=3):
+    """
+    Yearly report for each currency in `columns`, a dict mapping every name
+    in COLUMNS to a sequence with one value per transaction (month is 1-12).
+    `window` is the number of months in the rolling average of spending.
+
+    Money is summed in integer cents, with each record's total rounded to
+    the cent like budgets and balances round it, so the totals match them
+    exactly. Only the statistics (averages, percentiles) go through floats.
+    """
+    currencies = sorted(set(columns['currency']))
+    if np is not None:
+        arrays = {name: np.asarray(values) for name, values in columns.items()}
+        # Amounts and taxes have 2 places and at most 10 digits, exact in float64
+        for name in ('amount', 'tax'):
+            arrays[name] = np.rint(arrays[name].astype(np.float64) * 100).astype(np.int64)
+        # Percentage taxes multiply two cent values; stay in Python ints if that could overflow
+        if not arrays['amount'].size or (
+            int(np.abs(arrays['amount']).max()) * (int(np.abs(arrays['tax']).max()) + 10000) < 2 ** 62
+        ):
+            return {
+                currency: _numpy_report(arrays, arrays['currency'] == currency, window)
+                for currency in currencies
+            }
+    return {
+        currency: _python_report(columns, [value == currency for value in columns['currency']], window)
+        for currency in currencies
+    }
+
+
+def _numpy_report(columns, selected, window):
+    month = columns['month'][selected].astype(np.int64) - 1
+    credit = columns['transaction_type'][selected] == 'credit'
+    percentage = columns['tax_type'][selected] == 'percentage'
+    amount = columns['amount'][selected]
+    tax = columns['tax'][selected]
+
+    # Same formula as ExpenseIncome.total, for every row at once, in cents
+    # and rounded half to even: amount + amount * tax / 100
+    quotient, remainder = np.divmod(amount * 10000 + amount * tax, 10000)
+    quotient += (remainder * 2 > 10000) | ((remainder * 2 == 10000) & (quotient % 2 == 1))
+    total = np.where(percentage, quotient, amount + tax)
+    tax_amount = total - amount
+
+    monthly_credit = np.zeros(12, dtype=np.int64)
+    np.add.at(monthly_credit, month[credit], total[credit])
+    monthly_debit = np.zeros(12, dtype=np.int64)
+    np.add.at(monthly_debit, month[~credit], total[~credit])
+
+    # Mean of the last `window` months; the first months average what exists
+    cumulative = np.concatenate(([0], np.cumsum(monthly_debit)))
+    ends = np.arange(1, 13)
+    starts = np.maximum(ends - window, 0)
+    rolling = (cumulative[ends] - cumulative[starts]) / (ends - starts)
+
+    debits = total[~credit]
+    if debits.size:
+        percentiles = np.percentile(debits, PERCENTILES)
+        mean, largest = debits.mean(), debits.max()
+    else:
+        percentiles, mean, largest = [0] * len(PERCENTILES), 0, 0
+
+    tax_by_type = {}
+    for tax_type, is_type in (('flat', ~percentage), ('percentage', percentage)):
+        tax_by_type[tax_type] = {}
+        for transaction_type, is_transaction in (('credit', credit), ('debit', ~credit)):
+            rows = is_type & is_transaction
+            tax_by_type[tax_type][transaction_type] = {
+                'count': int(rows.sum()),
+                'amount': from_cents(amount[rows].sum()),
+                'tax': from_cents(tax_amount[rows].sum()),
+            }
+
+    return _report(
+        count=int(month.size),
+        monthly_credit=monthly_credit,
+        monthly_debit=monthly_debit,
+        rolling=rolling,
+        percentiles=percentiles,
+        mean=mean,
+        largest=largest,
+        tax_by_type=tax_by_type,
+    )
+
+
+def _python_report(columns, selected, window):
+    monthly_credit = [0] * 12
+    monthly_debit = [0] * 12
+    debits = []
+    tax_by_type = {
+        tax_type: {transaction_type: [0, 0, 0] for transaction_type in TRANSACTION_TYPES}
+        for tax_type in TAX_TYPES
+    }
+    count = 0
+
+    rows = zip(*(columns[name] for name in COLUMNS))
+    for keep, (month, transaction_type, amount, tax, tax_type, _) in zip(selected, rows):
+        if not keep:
+            continue
+        count += 1
+        amount, tax = cents(amount), cents(tax)
+        if tax_type == 'percentage':
+            total = round_half_even(amount * 10000 + amount * tax, 10000)
+        else:
+            total = amount + tax
+        tax_amount = total - amount
+
+        if transaction_type == 'credit':
+            monthly_credit[month - 1] += total
+        else:
+            monthly_debit[month - 1] += total
+            debits.append(total)
+
+        totals = tax_by_type['percentage' if tax_type == 'percentage' else 'flat'][transaction_type]
+        totals[0] += 1
+        totals[1] += amount
+        totals[2] += tax_amount
+
+    rolling = []
+    for end in range(1, 13):
+        start = max(end - window, 0)
+        rolling.append(sum(monthly_debit[start:end]) / (end - start))
+
+    debits.sort()
+    if debits:
+        percentiles = [_percentile(debits, q) for q in PERCENTILES]
+        mean, largest = sum(debits) / len(debits), debits[-1]
+    else:
+        percentiles, mean, largest = [0] * len(PERCENTILES), 0, 0
+
+    return _report(
+        count=count,
+        monthly_credit=monthly_credit,
+        monthly_debit=monthly_debit,
+        rolling=rolling,
+        percentiles=percentiles,
+        mean=mean,
+        largest=largest,
+        tax_by_type={
+            tax_type: {
+                transaction_type: {'count': n, 'amount': from_cents(amount), 'tax': from_cents(tax)}
+                for transaction_type, (n, amount, tax) in by_transaction.items()
+            }
+            for tax_type, by_transaction in tax_by_type.items()
+        },
+    )
+
+
+def _percentile(ordered, q):
+    # Linear interpolation between the closest ranks, like numpy.percentile
+    position = (len(ordered) - 1) * q / 100
+    low, high = math.floor(position), math.ceil(position)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def _report(count, monthly_credit, monthly_debit, rolling, percentiles, mean, largest, tax_by_type):
+    # Sums are exact cents; the statistics are rounded from cents as floats
+    total_credit = from_cents(sum(monthly_credit))
+    total_debit = from_cents(sum(monthly_debit))
+    return {
+        'count': count,
+        'total_credit': total_credit,
+        'total_debit': total_debit,
+        'balance': total_credit - total_debit,
+        'months': [
+            {
+                'month': month,
+                'credit': from_cents(monthly_credit[month - 1]),
+                'debit': from_cents(monthly_debit[month - 1]),
+                'rolling_debit_average': money(rolling[month - 1] / 100),
+            }
+            for month in range(1, 13)
+        ],
+        'debit_statistics': {
+            'mean': money(mean / 100),
+            'max': from_cents(largest),
+            **{f'p{q}': money(value / 100) for q, value in zip(PERCENTILES, percentiles)},
+        },
+        'tax_by_type': tax_by_type,
+    }
@@ -0,0 +1,117 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.functions import ExtractMonth
+
+from .balances import get_balance
+from .models import ExpenseIncome
+from .report_stats import COLUMNS, build_report
+
+
+_pool = None
+_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    The REPORT_CACHE alias. Finished reports and the markers of reports
+    being computed live there, so with several server processes it must be
+    shared (e.g. redis): otherwise a retried request usually lands on a
+    process that never saw the report and computes it again.
+    """
+    return caches[settings.REPORT_CACHE]
+
+
+def get_pool():
+    """
+    Process pool for large reports, created on first use. Workers are
+    spawned rather than forked so they don't inherit the request worker's
+    threads and database connections; report_stats needs no Django setup.
+    """
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.REPORT_POOL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def discard_pool():
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def data_version(user_id):
+    """
+    Changes whenever the user's records do: the version of their balance,
+    which every write bumps, read by primary key.
+    """
+    return get_balance(user_id).version
+
+
+def load_columns(user_id, year, currency=None):
+    """One query for the year's rows, returned as a column per field"""
+    expenses = ExpenseIncome.objects.filter(user_id=user_id, created_at__year=year)
+    if currency:
+        expenses = expenses.filter(currency=currency)
+    rows = expenses.annotate(month=ExtractMonth('created_at')).values_list(*COLUMNS).order_by()
+    columns = list(zip(*rows)) or [()] * len(COLUMNS)
+    return dict(zip(COLUMNS, columns))
+
+
+def yearly_report(user_id, year, window=3, currency=None):
+    """
+    Returns the report, or None while it is being computed in the pool.
+
+    Finished reports are cached under the user's data version, so they are
+    served until the user's data changes. Reports over more than
+    REPORT_POOL_MIN_ROWS rows are computed in a worker process instead of
+    the request worker; the caller should ask again later. A marker taken
+    with cache.add(), which is atomic, makes sure only one process submits
+    each report; it expires after REPORT_PENDING_TIMEOUT seconds in case
+    that process dies before storing it.
+    """
+    cache = get_cache()
+    key = f"expense-report:{user_id}:{year}:{window}:{currency or ''}:{data_version(user_id)}"
+    report = cache.get(key)
+    if report is not None:
+        return report
+    if cache.get(f"{key}:pending"):
+        return None
+
+    columns = load_columns(user_id, year, currency)
+    if len(columns['month']) < settings.REPORT_POOL_MIN_ROWS:
+        report = build_report(columns, window)
+        cache.set(key, report, settings.REPORT_CACHE_TIMEOUT)
+        return report
+
+    if not cache.add(f"{key}:pending", 1, settings.REPORT_PENDING_TIMEOUT):
+        return None
+    try:
+        future = get_pool().submit(build_report, columns, window)
+    except BrokenProcessPool:
+        # A pool worker died; start a new pool next time and answer this one inline
+        discard_pool()
+        report = build_report(columns, window)
+        cache.set(key, report, settings.REPORT_CACHE_TIMEOUT)
+        cache.delete(f"{key}:pending")
+        return report
+    future.add_done_callback(lambda future: _store(key, future))
+    return None
+
+
+def _store(key, future):
+    cache = get_cache()
+    # A failed report is not cached, so the next request submits it again
+    if future.exception() is None:
+        cache.set(key, future.result(), settings.REPORT_CACHE_TIMEOUT)
+    cache.delete(f"{key}:pending")
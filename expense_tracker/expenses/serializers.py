@@ -1,17 +1,130 @@
 from rest_framework import serializers
-from .models import ExpenseIncome
+from django.contrib.auth.models import User
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from .models import ExpenseIncome, ExpenseIncomeChange, Category, Tag, RecurringRule, Budget
 
 
-class ExpenseIncomeSerializer(serializers.ModelSerializer):
-    total = serializers.ReadOnlyField()
+def validate_currency_code(value):
+    # ISO 4217 style three letter code, stored upper case
+    if len(value) != 3 or not value.isalpha():
+        raise serializers.ValidationError('Currency must be a three letter code.')
+    return value.upper()
+
+
+class ProjectedFieldsMixin:
+    """
+    Model serializer that can be limited to a subset of its fields with
+    `fields=[...]` and can restrict a queryset to the columns and relations
+    those fields read, so lists don't load data they never output.
+    
+    Fields that aren't backed by a model field (properties) list the columns
+    they need in Meta.field_dependencies. Anything else that isn't a model
+    field is assumed to be a query annotation and left alone.
+    """
+    
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+    
+    def project(self, queryset):
+        model = self.Meta.model
+        dependencies = getattr(self.Meta, 'field_dependencies', {})
+        columns = {model._meta.pk.name}
+        select_related = []
+        prefetch_related = []
+        
+        for name, field in self.fields.items():
+            if name in dependencies:
+                columns.update(dependencies[name])
+                continue
+            
+            source = field.source.split('.')[0]
+            try:
+                model_field = model._meta.get_field(source)
+            except FieldDoesNotExist:
+                continue
+            
+            if model_field.many_to_many:
+                related_model = model_field.related_model
+                related_columns = _related_columns(getattr(field, 'child_relation', field), related_model)
+                prefetch_related.append(Prefetch(source, queryset=related_model.objects.only(*related_columns)))
+            elif model_field.is_relation:
+                columns.add(source)
+                related_columns = _related_columns(field, model_field.related_model)
+                if len(related_columns) > 1:
+                    select_related.append(source)
+                    columns.update(f'{source}__{column}' for column in related_columns)
+            else:
+                columns.add(source)
+        
+        # select_related() without arguments would follow every foreign key
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        return queryset.prefetch_related(*prefetch_related).only(*columns)
+
+
+def _related_columns(field, related_model):
+    # Columns of the related model a relation field reads, primary key first
+    columns = [related_model._meta.pk.name]
+    if isinstance(field, serializers.BaseSerializer):
+        columns += [child.source for child in field.fields.values()]
+    elif isinstance(field, serializers.SlugRelatedField):
+        columns.append(field.slug_field)
+    return list(dict.fromkeys(columns))
+
+
+class CategorySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'created_at']
+        read_only_fields = ['id', 'created_at']
+    
+    def validate_name(self, value):
+        if Category.objects.filter(user=self.context['request'].user, name=value).exists():
+            raise serializers.ValidationError('You already have a category with this name.')
+        return value
+
+
+class TagSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Tag
+        fields = ['id', 'name']
+        read_only_fields = ['id']
+    
+    def validate_name(self, value):
+        if Tag.objects.filter(user=self.context['request'].user, name=value).exists():
+            raise serializers.ValidationError('You already have a tag with this name.')
+        return value
+
+
+class ExpenseIncomeSerializer(ProjectedFieldsMixin, serializers.ModelSerializer):
+    # Rounded to the cent like budgets and balances count it
+    total = serializers.DecimalField(max_digits=20, decimal_places=2, read_only=True)
     
     class Meta:
         model = ExpenseIncome
         fields = [
-            'id', 'title', 'description', 'amount', 'transaction_type',
-            'tax', 'tax_type', 'total', 'created_at', 'updated_at'
+            'id', 'title', 'description', 'amount', 'currency', 'transaction_type',
+            'tax', 'tax_type', 'total', 'category', 'tags', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'total']
+        field_dependencies = {'total': ['amount', 'tax', 'tax_type']}
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        # Categories and tags can only come from the record owner's own set
+        owner = self.instance.user if isinstance(self.instance, ExpenseIncome) else None
+        if owner is None and 'request' in self.context:
+            owner = self.context['request'].user
+        fields['category'].queryset = Category.objects.filter(user=owner)
+        fields['tags'].child_relation.queryset = Tag.objects.filter(user=owner)
+        return fields
+    
+    def validate_currency(self, value):
+        return validate_currency_code(value)
     
     def create(self, validated_data):
         # Automatically set the user to the authenticated user
@@ -19,11 +132,126 @@ class ExpenseIncomeSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class ExpenseIncomeListSerializer(serializers.ModelSerializer):
-    total = serializers.ReadOnlyField()
+class RecurringRuleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RecurringRule
+        fields = [
+            'id', 'title', 'description', 'amount', 'currency', 'transaction_type',
+            'tax', 'tax_type', 'category', 'frequency', 'interval', 'start_date',
+            'end_date', 'max_occurrences', 'occurrences_created', 'next_run',
+            'is_active', 'created_at'
+        ]
+        read_only_fields = ['id', 'occurrences_created', 'next_run', 'is_active', 'created_at']
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        fields['category'].queryset = Category.objects.filter(user=self.context['request'].user)
+        return fields
+    
+    def validate_currency(self, value):
+        return validate_currency_code(value)
+    
+    def validate_interval(self, value):
+        if value < 1:
+            raise serializers.ValidationError('Interval must be at least 1.')
+        return value
+    
+    def validate(self, attrs):
+        if attrs.get('end_date') and attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError("end_date can't be before start_date.")
+        return attrs
+
+
+class BudgetSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Budget
+        fields = ['id', 'name', 'category', 'currency', 'period', 'limit', 'alert_threshold', 'created_at']
+        read_only_fields = ['id', 'created_at']
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        fields['category'].queryset = Category.objects.filter(user=self.context['request'].user)
+        return fields
+    
+    def validate_currency(self, value):
+        return validate_currency_code(value)
+    
+    def validate_limit(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('Limit must be greater than zero.')
+        return value
+    
+    def validate_alert_threshold(self, value):
+        if not 1 <= value <= 100:
+            raise serializers.ValidationError('Alert threshold must be a percentage between 1 and 100.')
+        return value
+
+
+class BudgetStatusSerializer(serializers.Serializer):
+    # Output of budgets.budget_status(); money as 2-place strings like the rest of the API
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    category = serializers.IntegerField(allow_null=True)
+    currency = serializers.CharField()
+    period = serializers.CharField()
+    period_start = serializers.DateField()
+    period_end = serializers.DateField()
+    limit = serializers.DecimalField(max_digits=20, decimal_places=2)
+    spent = serializers.DecimalField(max_digits=20, decimal_places=2)
+    remaining = serializers.DecimalField(max_digits=20, decimal_places=2)
+    alert_threshold = serializers.IntegerField()
+    alert = serializers.BooleanField()
+    exceeded = serializers.BooleanField()
+
+
+class ExpenseIncomeListSerializer(ProjectedFieldsMixin, serializers.ModelSerializer):
+    # Load rows through project() so category and tags don't query per row
+    total = serializers.DecimalField(max_digits=20, decimal_places=2, read_only=True)
+    category = serializers.SlugRelatedField(slug_field='name', read_only=True)
+    tags = serializers.SlugRelatedField(slug_field='name', many=True, read_only=True)
     
     class Meta:
         model = ExpenseIncome
         fields = [
-            'id', 'title', 'amount', 'transaction_type', 'total', 'created_at'
-        ] 
\ No newline at end of file
+            'id', 'title', 'amount', 'currency', 'transaction_type', 'total',
+            'category', 'tags', 'created_at'
+        ]
+        field_dependencies = {'total': ['amount', 'tax', 'tax_type']}
+
+
+class ConvertedExpenseIncomeListSerializer(ExpenseIncomeListSerializer):
+    # Expects rows annotated by ExpenseIncome.objects.convert_to()
+    converted_total = serializers.DecimalField(max_digits=20, decimal_places=2, read_only=True)
+    
+    class Meta(ExpenseIncomeListSerializer.Meta):
+        fields = ExpenseIncomeListSerializer.Meta.fields + ['converted_total']
+
+
+class ConvertedExpenseIncomeSerializer(ExpenseIncomeSerializer):
+    # Detail shape of ConvertedExpenseIncomeListSerializer
+    converted_total = serializers.DecimalField(max_digits=20, decimal_places=2, read_only=True)
+    
+    class Meta(ExpenseIncomeSerializer.Meta):
+        fields = ExpenseIncomeSerializer.Meta.fields + ['converted_total'] 
+
+
+class OwnerSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'email']
+
+
+class AdminExpenseIncomeListSerializer(ExpenseIncomeListSerializer):
+    user = OwnerSerializer(read_only=True)
+    
+    class Meta(ExpenseIncomeListSerializer.Meta):
+        fields = [
+            'id', 'user', 'title', 'amount', 'currency', 'transaction_type', 'total',
+            'category', 'created_at'
+        ]
+
+
+class ExpenseIncomeChangeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ExpenseIncomeChange
+        fields = ['id', 'action', 'actor_id', 'changes', 'created_at']
@@ -1,3 +1,797 @@
-from django.test import TestCase
+import os
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.db.models import Q
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import audit, balances, budgets, purge, report_stats, reports, views
+from .batching import iterate_in_chunks, pk_ranges
+from .models import (
+    Balance, Budget, BudgetPeriod, Category, ExpenseIncome, ExpenseIncomeChange, IdempotencyKey,
+    MaintenanceCheckpoint, RecurringRule, Tag,
+)
+from .maintenance import run_job
+from .pagination import encode_cursor
+from .management.commands.validate_tax import TaxJob
+from .recurring import materialize_due_rules
+
+
+class APITestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, **data):
+        data = {'title': 'Lunch', 'amount': '1.00', 'transaction_type': 'debit', **data}
+        response = self.client.post('/api/expenses/create/', data, format='json')
+        self.assertEqual(response.json().get('status'), 201, response.content)
+        return response.json()
+
+
+class SummaryTests(APITestCase):
+
+    def test_totals_are_rounded_to_the_cent(self):
+        for _ in range(3):
+            self.create(amount='1.01', tax='12.5', tax_type='percentage')
+        self.create(amount='100.00', transaction_type='credit', tax='0.33', tax_type='percentage')
+
+        response = self.client.get('/api/expenses/summary/')
+        usd = response.json()['currencies'][0]
+        self.assertEqual(usd['total_debit'], '3.42')
+        self.assertEqual(usd['total_credit'], '100.33')
+        self.assertEqual(usd['balance'], '96.91')
+
+    def test_summary_matches_the_balance_and_listed_totals(self):
+        for _ in range(3):
+            self.create(amount='33.33', tax='10', tax_type='percentage')
+
+        usd = self.client.get('/api/expenses/summary/').json()['currencies'][0]
+        self.assertEqual((usd['total_debit'], usd['count']), ('109.98', 3))
+        balance = self.client.get('/auth/profile/').json()['balance']['currencies'][0]
+        self.assertEqual(Decimal(str(balance['total_debit'])), Decimal(usd['total_debit']))
+        listed = self.client.get('/api/expenses/').json()['results']
+        self.assertEqual(sum(Decimal(row['total']) for row in listed), Decimal('109.98'))
+
+        by_category = self.client.get('/api/expenses/summary/?group_by=category').json()['categories']
+        self.assertEqual(by_category[0]['total_debit'], '109.98')
+
+    def test_record_total_is_rounded_to_the_cent(self):
+        record = self.create(amount='1.01', tax='12.5', tax_type='percentage')
+        self.assertEqual(record['total'], '1.14')
+        listed = self.client.get('/api/expenses/').json()
+        rows = listed['results'] if isinstance(listed, dict) else listed
+        self.assertEqual(rows[0]['total'], '1.14')
+        self.assertEqual(ExpenseIncome.objects.get().total, Decimal('1.13625'))
+
+
+class RecurringTests(APITestCase):
+
+    def make_rule(self, **fields):
+        fields = {
+            'user': self.user, 'title': 'Rent', 'amount': Decimal('500.00'), 'transaction_type': 'debit',
+            'frequency': 'monthly', 'start_date': date(2026, 1, 31), **fields,
+        }
+        return RecurringRule.objects.create(**fields)
+
+    def test_backfilled_occurrences_are_dated_on_their_day(self):
+        rule = self.make_rule()
+        materialize_due_rules(today=date(2026, 4, 15))
+
+        rows = ExpenseIncome.objects.filter(recurring_rule=rule).order_by('occurrence_date')
+        self.assertEqual(
+            [row.occurrence_date for row in rows],
+            [date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31)],
+        )
+        for row in rows:
+            self.assertEqual(timezone.localdate(row.created_at), row.occurrence_date)
+        rule.refresh_from_db()
+        self.assertEqual(rule.next_run, date(2026, 4, 30))
+
+    def test_backfill_counts_in_the_budget_period_it_belongs_to(self):
+        budget = Budget.objects.create(user=self.user, name='Rent', limit=Decimal('1000.00'), period='monthly')
+        self.make_rule()
+        materialize_due_rules(today=date(2026, 4, 15))
+
+        spent = dict(budget.periods.values_list('period_start', 'spent'))
+        self.assertEqual(spent, {
+            date(2026, 1, 1): Decimal('500.00'),
+            date(2026, 2, 1): Decimal('500.00'),
+            date(2026, 3, 1): Decimal('500.00'),
+        })
+        self.assertEqual(budgets.recompute_budget(budget, dry_run=True), 0)
+
+    def test_occurrences_are_in_the_change_log(self):
+        self.make_rule()
+        with self.captureOnCommitCallbacks(execute=True):
+            materialize_due_rules(today=date(2026, 4, 15))
+        materialize_due_rules(today=date(2026, 4, 15))
+
+        for record in ExpenseIncome.objects.all():
+            entries = list(audit.history(record.pk))
+            self.assertEqual([(entry.action, entry.actor_id) for entry in entries], [('create', None)])
+            self.assertEqual(entries[0].changes['amount'], [None, '500.00'])
+
+    def test_command_lists_the_budgets_the_occurrences_push_over_their_threshold(self):
+        Budget.objects.create(user=self.user, name='Rent', limit=Decimal('600.00'), period='monthly')
+        Budget.objects.create(user=self.user, name='Yearly', limit=Decimal('5000.00'), period='yearly')
+        self.make_rule()
+        output = StringIO()
+        call_command('materialize_recurring', '--date', '2026-04-15', stdout=output)
+        self.assertEqual(output.getvalue().count('(Rent) reached 500.00 of 600.00 USD'), 3)
+        self.assertNotIn('Yearly', output.getvalue())
+
+    def test_rule_without_occurrences_writes_nothing(self):
+        rule = self.make_rule(max_occurrences=0)
+        self.assertIsNone(rule.next_run)
+        self.assertEqual(materialize_due_rules(today=date(2026, 4, 15)), (0, 0))
+        self.assertFalse(ExpenseIncome.objects.exists())
+
+    def test_rerun_is_a_no_op(self):
+        self.make_rule()
+        materialize_due_rules(today=date(2026, 4, 15))
+        materialize_due_rules(today=date(2026, 4, 15))
+        self.assertEqual(ExpenseIncome.objects.count(), 3)
+        self.assertEqual(balances.get_balance(self.user.pk).totals, {'USD': {'credit': '0.00', 'debit': '1500.00'}})
+
+
+    def test_only_inserted_occurrences_are_added_to_the_balance(self):
+        rule = self.make_rule()
+        self.create(amount='10.00')
+        # Left behind by an interrupted run, already counted in the balance
+        january = ExpenseIncome.objects.create(**{
+            field: getattr(rule.build_occurrence(date(2026, 1, 31)), field)
+            for field in ('user_id', 'title', 'amount', 'transaction_type', 'recurring_rule_id', 'occurrence_date')
+        })
+        balances.apply_expense(january)
+        version = balances.get_balance(self.user.pk).version
+
+        with mock.patch.object(balances, 'actual_totals', side_effect=AssertionError('re-summed')):
+            self.assertEqual(materialize_due_rules(today=date(2026, 4, 15)), (1, 2))
+        balance = balances.get_balance(self.user.pk)
+        self.assertEqual(balance.totals, {'USD': {'credit': '0.00', 'debit': '1510.00'}})
+        self.assertEqual(balance.version, version + 1)
+        self.assertEqual(balances.recompute_balances([self.user.pk], dry_run=True), [])
+
+        profile = self.client.get('/auth/profile/').json()['balance']['currencies'][0]
+        self.assertEqual((profile['total_debit'], profile['balance']), ('1510.00', '-1510.00'))
+
+
+class BudgetTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.budget = Budget.objects.create(user=self.user, name='Food', limit=Decimal('100.00'))
+
+    def spent(self):
+        return budgets.current_statuses([self.budget])[0]['spent']
+
+    def assert_no_drift(self):
+        self.assertEqual(budgets.recompute_budget(self.budget, dry_run=True), 0)
+        output = StringIO()
+        call_command('reconcile_budgets', '--dry-run', '--restart', stdout=output)
+        self.assertIn('0 had drifted', output.getvalue())
+
+    def test_running_total_and_recompute_round_the_same_way(self):
+        for _ in range(3):
+            self.create(amount='1.00', tax='0.5', tax_type='percentage')
+        self.assertEqual(self.spent(), Decimal('3.00'))
+        self.assert_no_drift()
+
+    def test_totals_follow_update_delete_and_restore(self):
+        record = self.create(amount='10.00')
+        other = self.create(amount='5.00')
+        self.assertEqual(self.spent(), Decimal('15.00'))
+
+        self.client.put(f"/api/expenses/{record['id']}/update/", {'amount': '12.50'}, format='json')
+        self.assertEqual(self.spent(), Decimal('17.50'))
+        self.assert_no_drift()
+
+        self.client.put(f"/api/expenses/{other['id']}/update/", {'transaction_type': 'credit'}, format='json')
+        self.assertEqual(self.spent(), Decimal('12.50'))
+        self.assert_no_drift()
+
+        self.client.delete(f"/api/expenses/{record['id']}/delete/")
+        self.assertEqual(self.spent(), Decimal('0.00'))
+        self.assert_no_drift()
+
+        self.client.post(f"/api/expenses/{record['id']}/restore/")
+        self.assertEqual(self.spent(), Decimal('12.50'))
+        self.assert_no_drift()
+
+    def test_update_only_alerts_on_a_real_crossing(self):
+        record = self.create(amount='85.00')
+        self.assertEqual(len(record['budget_alerts']), 1)
+        url = f"/api/expenses/{record['id']}/update/"
+
+        with mock.patch.object(BudgetPeriod, 'save', autospec=True, side_effect=BudgetPeriod.save) as save:
+            response = self.client.put(url, {'title': 'Groceries'}, format='json')
+        self.assertEqual(response.json()['budget_alerts'], [])
+        save.assert_not_called()
+
+        self.assertEqual(self.client.put(url, {'amount': '90.00'}, format='json').json()['budget_alerts'], [])
+        self.client.put(url, {'amount': '10.00'}, format='json')
+        self.assertEqual(len(self.client.put(url, {'amount': '80.00'}, format='json').json()['budget_alerts']), 1)
+        self.assertEqual(self.spent(), Decimal('80.00'))
+
+    def test_budget_money_is_rendered_as_strings_everywhere(self):
+        alert = self.create(amount='85.00')['budget_alerts'][0]
+        listed = self.client.get('/api/budgets/').json()[0]
+        detail = self.client.get(f'/api/budgets/{self.budget.pk}/').json()
+        for status in (alert, listed, detail):
+            self.assertEqual(
+                (status['limit'], status['spent'], status['remaining']),
+                ('100.00', '85.00', '15.00'),
+            )
+        self.assertEqual(alert, listed)
+
+    def test_recompute_fixes_a_drifted_total(self):
+        self.create(amount='10.00')
+        self.budget.periods.update(spent=Decimal('99.00'))
+        self.assertEqual(budgets.recompute_budget(self.budget), 1)
+        self.assertEqual(self.spent(), Decimal('10.00'))
+
+
+class AdminTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.admin)
+        self.budget = Budget.objects.create(user=self.user, name='All', limit=Decimal('100.00'))
+
+    def test_change_form_offers_only_the_owners_categories_and_tags(self):
+        mine = Category.objects.create(user=self.user, name='Food')
+        Category.objects.create(user=self.admin, name='Travel')
+        Tag.objects.create(user=self.admin, name='work')
+        record = ExpenseIncome.objects.create(user=self.user, title='Lunch', amount=Decimal('1.00'), transaction_type='debit')
+
+        form = self.client.get(f'/admin/expenses/expenseincome/{record.pk}/change/').context['adminform'].form
+        self.assertEqual(list(form.fields['category'].queryset), [mine])
+        self.assertEqual(list(form.fields['tags'].queryset), [])
+
+    def test_bulk_action_recomputes_only_the_changed_periods(self):
+        january = ExpenseIncome.objects.create(user=self.user, title='A', amount=Decimal('10.00'), transaction_type='credit')
+        ExpenseIncome.objects.filter(pk=january.pk).update(created_at=timezone.make_aware(datetime(2026, 1, 15)))
+        march = ExpenseIncome.objects.create(user=self.user, title='B', amount=Decimal('20.00'), transaction_type='credit')
+        ExpenseIncome.objects.filter(pk=march.pk).update(created_at=timezone.make_aware(datetime(2026, 3, 15)))
+        # A drifted period the selection doesn't touch
+        BudgetPeriod.objects.create(budget=self.budget, period_start=date(2026, 2, 1), spent=Decimal('7.00'))
+
+        self.client.post('/admin/expenses/expenseincome/', {
+            'action': 'mark_as_debit', '_selected_action': [january.pk, march.pk],
+        })
+
+        spent = dict(self.budget.periods.values_list('period_start', 'spent'))
+        self.assertEqual(spent, {
+            date(2026, 1, 1): Decimal('10.00'),
+            date(2026, 2, 1): Decimal('7.00'),
+            date(2026, 3, 1): Decimal('20.00'),
+        })
+        self.assertEqual(balances.get_balance(self.user.pk).totals, {'USD': {'credit': '0.00', 'debit': '30.00'}})
+
+
+    def test_changelist_uses_the_estimated_count(self):
+        with mock.patch('expenses.pagination.estimated_row_count', return_value=123456) as estimate:
+            changelist = self.client.get('/admin/expenses/expenseincome/').context['cl']
+            self.assertEqual(changelist.result_count, 123456)
+            # estimated from a partial index on the live rows, not the whole table
+            relation = estimate.call_args.args[0]
+            index = next(index for index in ExpenseIncome._meta.indexes if index.name == relation)
+            self.assertEqual(index.condition, Q(deleted_at__isnull=True))
+
+            estimate.reset_mock()
+            changelist = self.client.get(f'/admin/expenses/expenseincome/?user__id__exact={self.user.pk}').context['cl']
+            estimate.assert_not_called()
+            self.assertEqual(changelist.result_count, 0)
+
+
+    def test_benchmark_seeds_dated_rows_and_purges_them(self):
+        output = StringIO()
+        with mock.patch('expenses.management.commands.benchmark_admin.purge_user', wraps=purge.purge_user) as purge_user:
+            call_command('benchmark_admin', '--rows', '30', '--users', '2', '--repeat', '1', '--cleanup', stdout=output)
+        self.assertIn('Benchmark table has 30 rows', output.getvalue())
+        self.assertEqual(purge_user.call_count, 3)
+        self.assertFalse(User.objects.filter(username__startswith='admin-benchmark').exists())
+        self.assertFalse(ExpenseIncome.all_objects.exists())
+
+class IdempotencyTests(APITestCase):
+
+    def post(self, key, **data):
+        data = {'title': 'Lunch', 'amount': '1.00', 'transaction_type': 'debit', **data}
+        return self.client.post('/api/expenses/create/', data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_original_response(self):
+        first = self.post('key-1')
+        retry = self.post('key-1')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(ExpenseIncome.objects.count(), 1)
+        self.assertEqual(balances.get_balance(self.user.pk).totals, {'USD': {'credit': '0.00', 'debit': '1.00'}})
+
+    def test_key_reused_for_a_different_request_is_rejected(self):
+        self.post('key-1')
+        response = self.post('key-1', amount='2.00')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(ExpenseIncome.objects.count(), 1)
+
+    def test_keys_are_per_user(self):
+        self.post('key-1')
+        other = User.objects.create_user('bob', 'bob@example.com', 'password')
+        self.client.force_authenticate(other)
+        self.assertNotIn('Idempotent-Replayed', self.post('key-1'))
+        self.assertEqual(ExpenseIncome.objects.count(), 2)
+
+    def test_failed_request_leaves_no_key_behind(self):
+        with mock.patch('expenses.views.budgets.apply_expense', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.post('key-1')
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertFalse(ExpenseIncome.objects.exists())
+
+        response = self.post('key-1')
+        self.assertEqual(response.json()['status'], 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_stale_pending_key_is_taken_over(self):
+        IdempotencyKey.objects.create(
+            user=self.user, key='key-1', fingerprint='x', expires_at=timezone.now() + timedelta(hours=1),
+        )
+        response = self.post('key-1')
+        self.assertEqual(response.json()['status'], 201)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 200)
+
+
+class ReportTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        # user ids and balance versions repeat between tests
+        reports.get_cache().clear()
+
+    def test_report_totals_match_the_balance_to_the_cent(self):
+        for amount, tax in [('1.00', '0.5'), ('1.01', '12.5'), ('0.10', '5'), ('999.99', '7.25'), ('3.33', '33.33')]:
+            self.create(amount=amount, tax=tax, tax_type='percentage')
+            self.create(amount=amount, tax=tax, tax_type='percentage', transaction_type='credit')
+        self.create(amount='2.50', tax='0.25')
+
+        report = reports.yearly_report(self.user.pk, timezone.now().year)['USD']
+        totals = balances.get_balance(self.user.pk).totals['USD']
+        self.assertEqual(report['total_debit'], Decimal(totals['debit']))
+        self.assertEqual(report['total_credit'], Decimal(totals['credit']))
+        self.assertEqual(report['balance'], Decimal(totals['credit']) - Decimal(totals['debit']))
+        tax = report['tax_by_type']['percentage']['debit']
+        self.assertEqual(tax['count'], 5)
+        self.assertEqual(tax['amount'] + tax['tax'] + Decimal('2.75'), report['total_debit'])
+
+    def test_report_money_is_rendered_as_strings(self):
+        self.create(amount='10.00')
+        usd = self.client.get('/api/expenses/report/').json()['currencies']['USD']
+        self.assertEqual((usd['total_debit'], usd['balance']), ('10.00', '-10.00'))
+        self.assertEqual(usd['months'][timezone.localdate().month - 1]['debit'], '10.00')
+
+    @override_settings(REPORT_POOL_MIN_ROWS=1)
+    def test_a_report_is_submitted_to_the_pool_once(self):
+        self.create(amount='10.00')
+        pool = mock.Mock()
+        with mock.patch.object(reports, 'get_pool', return_value=pool):
+            self.assertIsNone(reports.yearly_report(self.user.pk, timezone.localdate().year))
+            # a retry, possibly in another process sharing the cache
+            self.assertIsNone(reports.yearly_report(self.user.pk, timezone.localdate().year))
+        pool.submit.assert_called_once()
+
+        future = pool.submit.return_value
+        future.exception.return_value = None
+        future.result.return_value = {'USD': {}}
+        store = future.add_done_callback.call_args.args[0]
+        store(future)
+        self.assertEqual(reports.yearly_report(self.user.pk, timezone.localdate().year), {'USD': {}})
+
+    def test_deploy_check_requires_a_shared_report_cache(self):
+        output = StringIO()
+        call_command('check', '--deploy', '--tag', 'caches', stdout=output, stderr=output)
+        self.assertIn('expenses.W001', output.getvalue())
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp'}}
+        with override_settings(CACHES=shared):
+            output = StringIO()
+            call_command('check', '--deploy', '--tag', 'caches', stdout=output, stderr=output)
+        self.assertNotIn('expenses.W001', output.getvalue())
+
+    def test_python_and_numpy_paths_agree(self):
+        if report_stats.np is None:
+            self.skipTest('NumPy is not installed')
+        columns = {
+            'month': [1, 1, 2, 12], 'transaction_type': ['debit', 'credit', 'debit', 'debit'],
+            'amount': [Decimal('1.00'), Decimal('1.01'), Decimal('0.10'), Decimal('999.99')],
+            'tax': [Decimal('0.5'), Decimal('12.5'), Decimal('1.00'), Decimal('7.25')],
+            'tax_type': ['percentage', 'percentage', 'flat', 'percentage'],
+            'currency': ['USD', 'USD', 'USD', 'EUR'],
+        }
+        with mock.patch.object(report_stats, 'np', None):
+            expected = report_stats.build_report(columns)
+        self.assertEqual(report_stats.build_report(columns), expected)
+
+
+class BalanceTests(APITestCase):
+
+    def totals(self):
+        return balances.get_balance(self.user.pk).totals
+
+    def assert_no_drift(self):
+        self.assertEqual(balances.recompute_balances([self.user.pk], dry_run=True), [])
+
+    def test_balance_follows_create_update_delete_and_restore(self):
+        record = self.create(amount='10.00', tax='0.5', tax_type='percentage')
+        self.create(amount='50.00', transaction_type='credit')
+        self.assertEqual(self.totals(), {'USD': {'credit': '50.00', 'debit': '10.05'}})
+
+        self.client.put(f"/api/expenses/{record['id']}/update/", {'currency': 'EUR'}, format='json')
+        self.assertEqual(self.totals(), {
+            'EUR': {'credit': '0.00', 'debit': '10.05'},
+            'USD': {'credit': '50.00', 'debit': '0.00'},
+        })
+        self.assert_no_drift()
+
+        self.client.delete(f"/api/expenses/{record['id']}/delete/")
+        self.assertEqual(self.totals(), {'USD': {'credit': '50.00', 'debit': '0.00'}})
+        self.assert_no_drift()
+
+        self.client.post(f"/api/expenses/{record['id']}/restore/")
+        self.assertEqual(self.totals()['EUR'], {'credit': '0.00', 'debit': '10.05'})
+        self.assert_no_drift()
+
+    def test_every_write_bumps_the_version(self):
+        record = self.create(amount='10.00')
+        version = balances.get_balance(self.user.pk).version
+        self.client.put(f"/api/expenses/{record['id']}/update/", {'title': 'Dinner'}, format='json')
+        self.assertEqual(balances.get_balance(self.user.pk).version, version + 1)
+
+        # An admin edit that leaves the totals as they are
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        self.client.post(f"/admin/expenses/expenseincome/{record['id']}/change/", {
+            'user': self.user.pk, 'title': 'Dinner', 'amount': '10.00', 'transaction_type': 'debit',
+            'tax': '0.00', 'tax_type': 'percentage', 'currency': 'USD',
+        })
+        self.assertEqual(ExpenseIncome.objects.get().tax_type, 'percentage')
+        self.assertEqual(balances.get_balance(self.user.pk).version, version + 2)
+
+    def test_change_is_kept_when_a_concurrent_write_creates_the_row(self):
+        theirs = ExpenseIncome.objects.create(user=self.user, title='A', amount=Decimal('5.00'), transaction_type='debit')
+        ours = ExpenseIncome.objects.create(user=self.user, title='B', amount=Decimal('7.00'), transaction_type='debit')
+        actual_totals = balances.actual_totals
+
+        def created_meanwhile(user_ids):
+            # The other writer's row, summed before our record was visible to it
+            Balance.objects.create(user_id=self.user.pk, totals={'USD': {'credit': '0.00', 'debit': '5.00'}}, version=1)
+            return actual_totals(user_ids)
+
+        with mock.patch('expenses.balances.actual_totals', side_effect=created_meanwhile):
+            balances.apply_expense(ours)
+
+        self.assertEqual(self.totals(), {'USD': {'credit': '0.00', 'debit': '12.00'}})
+        self.assertEqual(theirs.total + ours.total, Decimal('12.00'))
+
+
+class SoftDeleteTests(APITestCase):
+
+    def test_only_one_of_two_deletes_moves_the_totals(self):
+        record = self.create(amount='10.00')
+        first = ExpenseIncome.objects.get(pk=record['id'])
+        second = ExpenseIncome.objects.get(pk=record['id'])
+        self.assertTrue(first.soft_delete())
+        self.assertFalse(second.soft_delete())
+        self.assertEqual(ExpenseIncome.all_objects.get().deleted_at, first.deleted_at)
+
+        self.assertTrue(first.restore())
+        self.assertFalse(second.restore())
+
+    def test_repeated_delete_and_restore_requests(self):
+        budget = Budget.objects.create(user=self.user, name='All', limit=Decimal('100.00'))
+        record = self.create(amount='10.00')
+
+        self.assertEqual(self.client.delete(f"/api/expenses/{record['id']}/delete/").status_code, 204)
+        self.assertEqual(self.client.delete(f"/api/expenses/{record['id']}/delete/").status_code, 404)
+        self.assertEqual(balances.get_balance(self.user.pk).totals, {})
+        self.assertEqual(budgets.current_statuses([budget])[0]['spent'], Decimal('0.00'))
+
+        self.assertEqual(self.client.post(f"/api/expenses/{record['id']}/restore/").json()['status'], 200)
+        self.assertEqual(self.client.post(f"/api/expenses/{record['id']}/restore/").status_code, 404)
+        self.assertEqual(balances.get_balance(self.user.pk).totals, {'USD': {'credit': '0.00', 'debit': '10.00'}})
+        self.assertEqual(budgets.current_statuses([budget])[0]['spent'], Decimal('10.00'))
+
+    def test_deleted_records_are_hidden_and_purged(self):
+        record = self.create(amount='10.00')
+        self.client.delete(f"/api/expenses/{record['id']}/delete/")
+        self.assertFalse(ExpenseIncome.objects.exists())
+        self.assertEqual(purge.purge_deleted(before=timezone.now() + timedelta(seconds=1)), 1)
+        self.assertFalse(ExpenseIncome.all_objects.exists())
+
+    def test_admin_account_deletion_purges_in_chunks(self):
+        for _ in range(3):
+            self.create(amount='10.00')
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+
+        confirm = self.client.get(f'/admin/auth/user/{self.user.pk}/delete/')
+        self.assertContains(confirm, 'Expense incomes: 3')
+        with mock.patch('expenses.admin.purge_user', wraps=purge.purge_user) as purge_user:
+            self.client.post(f'/admin/auth/user/{self.user.pk}/delete/', {'post': 'yes'})
+        purge_user.assert_called_once_with(self.user.pk)
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(ExpenseIncome.all_objects.exists())
+
+
+class ChangeLogTests(APITestCase):
+
+    def test_history_lists_every_write(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record = self.create(amount='10.00')
+            self.client.put(f"/api/expenses/{record['id']}/update/", {'amount': '12.00'}, format='json')
+            self.client.delete(f"/api/expenses/{record['id']}/delete/")
+            self.client.post(f"/api/expenses/{record['id']}/restore/")
+
+        history = self.client.get(f"/api/expenses/{record['id']}/history/").json()['history']
+        self.assertEqual([entry['action'] for entry in history], ['create', 'update', 'delete', 'restore'])
+        self.assertEqual(history[1]['changes'], {'amount': ['10.00', '12.00']})
+
+    @override_settings(AUDIT_LOG_MAX_BUFFERED=3, AUDIT_LOG_BATCH_SIZE=100)
+    def test_buffer_is_bounded_while_the_database_is_down(self):
+        buffer = audit.ChangeBuffer()
+        buffer.flusher_pid = os.getpid()  # no background thread in tests
+        for record_id in range(5):
+            buffer.add(ExpenseIncomeChange(record_id=record_id, action='create', changes={}))
+        self.assertEqual(len(buffer.entries), 3)
+
+        with mock.patch.object(ExpenseIncomeChange.objects, 'bulk_create', side_effect=DatabaseError):
+            with self.assertLogs('expenses.audit', 'ERROR') as logs:
+                self.assertEqual(buffer.flush(), 0)
+        self.assertIn('Dropped 2 change log entries', logs.output[0])
+        buffer.add(ExpenseIncomeChange(record_id=5, action='create', changes={}))
+        self.assertEqual([entry.record_id for entry in buffer.entries], [0, 1, 2])
+
+        with self.assertLogs('expenses.audit', 'ERROR') as logs:
+            self.assertEqual(buffer.flush(), 3)
+        self.assertIn('Dropped 1 change log entries', logs.output[0])
+        self.assertEqual(ExpenseIncomeChange.objects.count(), 3)
+
+
+class AdminEndpointTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_authenticate(self.admin)
+
+    def walk(self, url):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            data = response.json()
+            seen.append(data['results'])
+            url = data['next'] and f"{url.split('cursor=')[0].rstrip('&')}&cursor={data['next']}"
+        return seen
+
+    def test_cursor_pages_cover_every_record_once_including_ties(self):
+        records = [
+            ExpenseIncome.objects.create(user=self.user, title=str(n), amount=Decimal('1.00'), transaction_type='debit')
+            for n in range(7)
+        ]
+        # Equal timestamps must be split by id, not skipped or repeated
+        ExpenseIncome.objects.filter(pk__in=[record.pk for record in records[2:6]]).update(
+            created_at=timezone.make_aware(datetime(2026, 1, 1))
+        )
+
+        pages = self.walk('/api/admin/expenses/?page_size=3')
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        ids = [row['id'] for page in pages for row in page]
+        self.assertEqual(sorted(ids), sorted(record.pk for record in records))
+        expected = ExpenseIncome.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        self.assertEqual(ids, list(expected))
+
+    def test_user_totals_are_paged_by_user_and_currency(self):
+        for currency in ('EUR', 'USD', 'GBP'):
+            ExpenseIncome.objects.create(user=self.user, title='A', amount=Decimal('1.00'), transaction_type='debit', currency=currency)
+        ExpenseIncome.objects.create(user=self.admin, title='B', amount=Decimal('2.00'), transaction_type='credit')
+
+        pages = self.walk('/api/admin/users/?page_size=2')
+        rows = [(row['user_id'], row['currency']) for page in pages for row in page]
+        self.assertEqual(rows, [
+            (self.user.pk, 'EUR'), (self.user.pk, 'GBP'), (self.user.pk, 'USD'), (self.admin.pk, 'USD'),
+        ])
+
+    def test_top_spenders_are_paged_through_equal_totals(self):
+        users = [self.user, self.admin] + [User.objects.create_user(f'user{n}') for n in range(3)]
+        for user in users:
+            # 3 x 33.33 + 10% tax sums to 109.989 in floating point on SQLite
+            for _ in range(3):
+                ExpenseIncome.objects.create(
+                    user=user, title='A', amount=Decimal('33.33'), tax=Decimal('10'), tax_type='percentage',
+                    transaction_type='debit',
+                )
+        ExpenseIncome.objects.create(user=users[3], title='B', amount=Decimal('5.00'), transaction_type='debit')
+
+        pages = self.walk('/api/admin/top-spenders/?page_size=2')
+        rows = [(row['user_id'], row['total']) for page in pages for row in page]
+        self.assertEqual(rows, [(users[3].pk, '114.99')] + [
+            (user.pk, '109.99') for user in sorted(users[:3] + users[4:], key=lambda user: user.pk)
+        ])
+
+    def test_invalid_cursor_and_non_superusers_are_rejected(self):
+        self.assertEqual(self.client.get('/api/admin/expenses/?cursor=not-a-cursor').status_code, 400)
+        for url, cursor in [
+            ('/api/admin/expenses/', ['2026-01-01T00:00:00+00:00', 'x']),
+            ('/api/admin/users/', ['x', 'USD']),
+            ('/api/admin/users/', [1, 2]),
+            ('/api/admin/top-spenders/', ['10.00', 'x']),
+            ('/api/admin/top-spenders/', [10, 1]),
+        ]:
+            response = self.client.get(url, {'cursor': encode_cursor(cursor)})
+            self.assertEqual(response.status_code, 400, (url, cursor))
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/admin/expenses/').status_code, 403)
+
+
+class CategoryAndTagTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.food = self.client.post('/api/categories/', {'name': 'Food'}, format='json').json()
+        self.work = self.client.post('/api/tags/', {'name': 'work'}, format='json').json()
+        self.trip = self.client.post('/api/tags/', {'name': 'trip'}, format='json').json()
+
+    def titles(self, query):
+        return sorted(row['title'] for row in self.client.get(f'/api/expenses/?{query}').json()['results'])
+
+    def test_list_filters(self):
+        self.create(title='Lunch', category=self.food['id'], tags=[self.work['id'], self.trip['id']])
+        self.create(title='Taxi', tags=[self.trip['id']])
+        self.create(title='Rent')
+
+        self.assertEqual(self.titles(f"category={self.food['id']}"), ['Lunch'])
+        self.assertEqual(self.titles('category=none'), ['Rent', 'Taxi'])
+        # Any of several tags, each record once
+        self.assertEqual(self.titles(f"tag={self.work['id']}&tag={self.trip['id']}"), ['Lunch', 'Taxi'])
+        self.assertEqual(self.client.get('/api/expenses/?tag=abc').status_code, 400)
+
+    def test_other_users_categories_and_tags_are_rejected(self):
+        other = User.objects.create_user('bob', 'bob@example.com', 'password')
+        theirs = Category.objects.create(user=other, name='Food')
+        their_tag = Tag.objects.create(user=other, name='work')
+
+        response = self.client.post('/api/expenses/create/', {
+            'title': 'Lunch', 'amount': '1.00', 'transaction_type': 'debit', 'category': theirs.pk,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/expenses/create/', {
+            'title': 'Lunch', 'amount': '1.00', 'transaction_type': 'debit', 'tags': [their_tag.pk],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_category_totals(self):
+        self.create(amount='10.00', category=self.food['id'])
+        self.create(amount='5.00', category=self.food['id'])
+        self.create(amount='3.00')
+
+        rows = self.client.get('/api/expenses/summary/?group_by=category').json()['categories']
+        totals = {row['category_name']: Decimal(str(row['total_debit'])) for row in rows}
+        self.assertEqual(totals, {'Food': Decimal('15.00'), None: Decimal('3.00')})
+
+
+class SparseFieldsTests(APITestCase):
+
+    def test_fields_limits_the_output(self):
+        self.create(amount='1.01', tax='12.5', tax_type='percentage')
+        rows = self.client.get('/api/expenses/?fields=id,total').json()['results']
+        self.assertEqual(set(rows[0]), {'id', 'total'})
+        self.assertEqual(rows[0]['total'], '1.14')
+
+    def test_only_the_needed_columns_are_loaded(self):
+        self.create()
+        expenses, serializer_class, fields, currency = views.project_list(
+            ExpenseIncome.objects.all(), mock.Mock(query_params=QueryDict('fields=id,title')),
+        )
+        self.assertEqual(expenses.query.deferred_loading, ({'id', 'title'}, False))
+        row = expenses.get()
+        self.assertLessEqual({'description', 'amount', 'created_at'}, row.get_deferred_fields())
+
+    def test_list_queries_do_not_grow_with_the_rows(self):
+        food = Category.objects.create(user=self.user, name='Food')
+        tag = Tag.objects.create(user=self.user, name='work')
+        for _ in range(5):
+            self.create(category=food.pk, tags=[tag.pk])
+        # count, page and one prefetch for the tags, however many rows
+        with self.assertNumQueries(3):
+            rows = self.client.get('/api/expenses/?fields=id,category,tags').json()['results']
+        self.assertEqual(rows[0], {'id': rows[0]['id'], 'category': 'Food', 'tags': ['work']})
+
+    def test_unknown_field_and_view_are_rejected(self):
+        self.assertEqual(self.client.get('/api/expenses/?fields=id,password').status_code, 400)
+        self.assertEqual(self.client.get('/api/expenses/?view=full').status_code, 400)
+
+
+class FailingTaxJob(TaxJob):
+    fail_at = None
+
+    def process(self, rows):
+        for expense in rows:
+            if expense.pk == self.fail_at:
+                raise RuntimeError('interrupted')
+        return []
+
+
+class MaintenanceTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.records = ExpenseIncome.objects.bulk_create([
+            ExpenseIncome(user=self.user, title=str(n), amount=Decimal('1.00'), transaction_type='debit')
+            for n in range(25)
+        ])
+        self.pks = sorted(record.pk for record in self.records)
+
+    def test_chunks_cover_every_row_once(self):
+        ranges = list(pk_ranges(ExpenseIncome.objects.all(), chunk_size=10))
+        self.assertEqual(len(ranges), 3)
+        self.assertEqual(ranges[-1][1], self.pks[-1])
+        chunks = list(iterate_in_chunks(ExpenseIncome.objects.all(), chunk_size=10))
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+        self.assertEqual([row.pk for chunk in chunks for row in chunk], self.pks)
+
+    def test_interrupted_run_resumes_from_its_checkpoint(self):
+        job = FailingTaxJob()
+        FailingTaxJob.fail_at = self.pks[15]
+        with self.assertRaises(RuntimeError):
+            run_job(job, chunk_size=5)
+        checkpoint = MaintenanceCheckpoint.objects.get(job=job.checkpoint_key)
+        self.assertEqual(checkpoint.last_pk, self.pks[14])
+        self.assertIsNone(checkpoint.finished_at)
+
+        FailingTaxJob.fail_at = None
+        run = run_job(job, chunk_size=5)
+        self.assertEqual(run.resumed_from, self.pks[14])
+        self.assertEqual(run.rows, 10)
+        checkpoint.refresh_from_db()
+        self.assertEqual(checkpoint.rows, 25)
+        self.assertIsNotNone(checkpoint.finished_at)
+
+        # A finished run starts over
+        self.assertEqual(run_job(job, chunk_size=5).rows, 25)
+
+    def test_validate_tax_reports_invalid_rows(self):
+        ExpenseIncome.objects.filter(pk=self.pks[3]).update(tax=Decimal('150.00'), tax_type='percentage')
+        ExpenseIncome.objects.filter(pk=self.pks[20]).update(tax=Decimal('-1.00'))
+        output = StringIO()
+        call_command('validate_tax', '--chunk-size', '7', stdout=output)
+        self.assertIn(f'{self.pks[3]}, {self.pks[20]}', output.getvalue())
+        self.assertIn('25', output.getvalue())
+
+    def test_normalize_currencies(self):
+        ExpenseIncome.objects.filter(pk=self.pks[0]).update(currency='usd')
+        call_command('normalize_currencies', '--dry-run', stdout=StringIO())
+        self.assertEqual(ExpenseIncome.objects.get(pk=self.pks[0]).currency, 'usd')
+        call_command('normalize_currencies', stdout=StringIO())
+        self.assertEqual(ExpenseIncome.objects.get(pk=self.pks[0]).currency, 'USD')
+
+    def test_verify_balances_repairs_drift_and_then_finds_none(self):
+        balances.get_balance(self.user.pk)
+        Balance.objects.filter(pk=self.user.pk).update(totals={})
+        output = StringIO()
+        call_command('verify_balances', stdout=output)
+        self.assertIn('1 had drifted', output.getvalue())
+        self.assertEqual(balances.get_balance(self.user.pk).totals, {'USD': {'credit': '0.00', 'debit': '25.00'}})
+
+        output = StringIO()
+        call_command('verify_balances', stdout=output)
+        self.assertIn('0 had drifted', output.getvalue())
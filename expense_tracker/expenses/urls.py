@@ -1,19 +1,25 @@
 from django.urls import path
-from .views import (
-    get_expenses,
-    create_expense,
-    get_expense_by_id,
-    update_expense,
-    delete_expense,
-    get_expenses_by_type,
-    
-)
+from expense_tracker.lazy import lazy_view
 
 urlpatterns = [
-    path('expenses/', get_expenses, name='get_expenses'),
-    path('expenses/create/', create_expense, name='create_expense'),
-    path('expenses/<int:id>/', get_expense_by_id, name='get_expense_by_id'),
-    path('expenses/<int:id>/update/', update_expense, name='update_expense'),
-    path('expenses/<int:id>/delete/', delete_expense, name='delete_expense'),
-    path('expenses/by-type/', get_expenses_by_type, name='get_expenses_by_type'), #optional test
+    path('expenses/', lazy_view('expenses.views.get_expenses'), name='get_expenses'),
+    path('expenses/create/', lazy_view('expenses.views.create_expense'), name='create_expense'),
+    path('expenses/<int:id>/', lazy_view('expenses.views.get_expense_by_id'), name='get_expense_by_id'),
+    path('expenses/<int:id>/update/', lazy_view('expenses.views.update_expense'), name='update_expense'),
+    path('expenses/<int:id>/delete/', lazy_view('expenses.views.delete_expense'), name='delete_expense'),
+    path('expenses/<int:id>/restore/', lazy_view('expenses.views.restore_expense'), name='restore_expense'),
+    path('expenses/<int:id>/history/', lazy_view('expenses.views.get_expense_history'), name='get_expense_history'),
+    path('expenses/by-type/', lazy_view('expenses.views.get_expenses_by_type'), name='get_expenses_by_type'), #optional test
+    path('expenses/summary/', lazy_view('expenses.views.get_expense_summary'), name='get_expense_summary'),
+    path('expenses/report/', lazy_view('expenses.views.get_expense_report'), name='get_expense_report'),
+    path('categories/', lazy_view('expenses.views.categories'), name='categories'),
+    path('tags/', lazy_view('expenses.views.tags'), name='tags'),
+    path('recurring/', lazy_view('expenses.views.recurring_rules'), name='recurring_rules'),
+    path('recurring/<int:id>/delete/', lazy_view('expenses.views.delete_recurring_rule'), name='delete_recurring_rule'),
+    path('budgets/', lazy_view('expenses.views.budget_list'), name='budget_list'),
+    path('budgets/<int:id>/', lazy_view('expenses.views.get_budget'), name='get_budget'),
+    path('budgets/<int:id>/delete/', lazy_view('expenses.views.delete_budget'), name='delete_budget'),
+    path('admin/expenses/', lazy_view('expenses.views.admin_expenses'), name='admin_expenses'),
+    path('admin/users/', lazy_view('expenses.views.admin_user_totals'), name='admin_user_totals'),
+    path('admin/top-spenders/', lazy_view('expenses.views.admin_top_spenders'), name='admin_top_spenders'),
 ] 
\ No newline at end of file
@@ -1,12 +1,105 @@
 from django.shortcuts import render
 from django.http import JsonResponse
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.status import HTTP_201_CREATED, HTTP_400_BAD_REQUEST, HTTP_200_OK, HTTP_204_NO_CONTENT, HTTP_404_NOT_FOUND, HTTP_403_FORBIDDEN
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.status import HTTP_201_CREATED, HTTP_202_ACCEPTED, HTTP_400_BAD_REQUEST, HTTP_200_OK, HTTP_204_NO_CONTENT, HTTP_404_NOT_FOUND, HTTP_403_FORBIDDEN
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.core.paginator import Paginator
-from .models import ExpenseIncome
-from .serializers import ExpenseIncomeSerializer, ExpenseIncomeListSerializer
+from django.conf import settings
+from django.db.models import Sum, Count, Min, Max, Q, F, Value
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
+from rest_framework.serializers import ValidationError
+from decimal import Decimal, InvalidOperation
+import copy
+from . import audit, balances, budgets, reports
+from .idempotency import idempotent
+from .pagination import cursor_value, decode_cursor, keyset_page
+from .permissions import IsSuperuser
+from .models import MONEY_FIELD, ExpenseIncome, Category, Tag, RecurringRule, Budget
+from .serializers import (
+    ExpenseIncomeSerializer,
+    ExpenseIncomeListSerializer,
+    ConvertedExpenseIncomeListSerializer,
+    ConvertedExpenseIncomeSerializer,
+    CategorySerializer,
+    TagSerializer,
+    RecurringRuleSerializer,
+    BudgetSerializer,
+    BudgetStatusSerializer,
+    AdminExpenseIncomeListSerializer,
+    ExpenseIncomeChangeSerializer,
+    validate_currency_code,
+)
+from expense_tracker.throttling import UserTokenBucketThrottle, IPTokenBucketThrottle
+
+
+def filter_by_category_and_tags(expenses, request):
+    """
+    Apply the ?category= and ?tag= list filters. `category=none` selects
+    uncategorized rows and `tag` may be repeated to match any of several
+    tags. Returns None when a value is not a valid id.
+    """
+    category = request.query_params.get('category')
+    tag_ids = request.query_params.getlist('tag')
+    
+    try:
+        if category == 'none':
+            expenses = expenses.filter(category__isnull=True)
+        elif category:
+            expenses = expenses.filter(category_id=int(category))
+        if tag_ids:
+            expenses = expenses.with_tags([int(tag_id) for tag_id in tag_ids])
+    except ValueError:
+        return None
+    return expenses
+
+
+LIST_SERIALIZERS = {
+    ('list', False): ExpenseIncomeListSerializer,
+    ('list', True): ConvertedExpenseIncomeListSerializer,
+    ('detail', False): ExpenseIncomeSerializer,
+    ('detail', True): ConvertedExpenseIncomeSerializer,
+}
+
+
+def project_list(expenses, request):
+    """
+    Apply the output options shared by the list endpoints:
+    ?view=list|detail picks the row shape, ?fields=a,b,c keeps only some of
+    its fields and ?currency=XXX adds converted_total. Only the columns the
+    chosen fields read are fetched. Returns (queryset, serializer class,
+    fields, currency) and raises ValueError for invalid options.
+    """
+    currency = request.query_params.get('currency')
+    if currency:
+        try:
+            currency = validate_currency_code(currency)
+        except ValidationError:
+            raise ValueError('Invalid currency code')
+    
+    view = request.query_params.get('view', 'list')
+    if view not in ('list', 'detail'):
+        raise ValueError('Invalid view, use list or detail')
+    serializer_class = LIST_SERIALIZERS[(view, bool(currency))]
+    
+    fields = request.query_params.get('fields')
+    if fields:
+        fields = [name.strip() for name in fields.split(',') if name.strip()]
+        unknown = set(fields) - set(serializer_class().fields)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    else:
+        fields = None
+    
+    expenses = serializer_class(fields=fields).project(expenses)
+    if currency:
+        expenses = expenses.convert_to(currency)
+    return expenses, serializer_class, fields, currency
 
 
 @api_view(['GET'])
@@ -21,6 +114,15 @@ def get_expenses(request):
     else:
         expenses = ExpenseIncome.objects.filter(user=user)
     
+    expenses = filter_by_category_and_tags(expenses, request)
+    if expenses is None:
+        return JsonResponse({'error': 'Invalid category or tag filter'}, status=HTTP_400_BAD_REQUEST)
+    
+    try:
+        expenses, serializer_class, fields, currency = project_list(expenses, request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=HTTP_400_BAD_REQUEST)
+    
     # Handle pagination
     page_size = request.query_params.get('page_size', 10)
     page_number = request.query_params.get('page', 1)
@@ -38,11 +140,12 @@ def get_expenses(request):
     except:
         return JsonResponse({'error': 'Invalid page number'}, status=HTTP_400_BAD_REQUEST)
     
-    serializer = ExpenseIncomeListSerializer(page_obj, many=True)
+    serializer = serializer_class(page_obj, many=True, fields=fields)
     
     # Build pagination response
     response_data = {
         'count': paginator.count,
+        'currency': currency,
         'next': f"?page={page_obj.next_page_number()}" if page_obj.has_next() else None,
         'previous': f"?page={page_obj.previous_page_number()}" if page_obj.has_previous() else None,
         'results': serializer.data
@@ -53,12 +156,19 @@ def get_expenses(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([UserTokenBucketThrottle, IPTokenBucketThrottle])
+@idempotent
 def create_expense(request):
     """Create a new expense/income record"""
     serializer = ExpenseIncomeSerializer(data=request.data, context={'request': request})
     if serializer.is_valid():
-        serializer.save(user=request.user)
-        return JsonResponse({**serializer.data, 'message': 'Expense/Income created successfully', 'status': HTTP_201_CREATED})
+        with transaction.atomic():
+            expense = serializer.save(user=request.user)
+            balances.apply_expense(expense)
+            alerts = budgets.apply_expense(expense)
+            values = audit.snapshot(expense, tags=serializer.validated_data.get('tags', []))
+            audit.log_change(expense.pk, 'create', audit.diff({}, values), actor_id=request.user.id)
+        return JsonResponse({**serializer.data, 'budget_alerts': BudgetStatusSerializer(alerts, many=True).data, 'message': 'Expense/Income created successfully', 'status': HTTP_201_CREATED}, encoder=DjangoJSONEncoder)
     return JsonResponse(serializer.errors, status=HTTP_400_BAD_REQUEST)
 
 
@@ -82,20 +192,34 @@ def get_expense_by_id(request, id):
 
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def update_expense(request, id):
     #Update a specific expense/income record
     try:
         user = request.user
-        if user.is_superuser:
-            expense = ExpenseIncome.objects.get(pk=id)
-        else:
-            expense = ExpenseIncome.objects.get(pk=id, user=user)
+        expenses = ExpenseIncome.objects.select_for_update()
+        if not user.is_superuser:
+            expenses = expenses.filter(user=user)
         
-        serializer = ExpenseIncomeSerializer(expense, data=request.data, partial=True)
-        if serializer.is_valid():
-            serializer.save()
-            return JsonResponse({**serializer.data, 'message': 'Expense/Income updated successfully', 'status': HTTP_200_OK})
-        return JsonResponse(serializer.errors, status=HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            # Locked until the write commits, so a concurrent update or delete
+            # can't move the budgets and balance from the same old values
+            expense = expenses.get(pk=id)
+            serializer = ExpenseIncomeSerializer(expense, data=request.data, partial=True, context={'request': request})
+            if not serializer.is_valid():
+                return JsonResponse(serializer.errors, status=HTTP_400_BAD_REQUEST)
+            
+            # the serializer updates `expense` in place, keep the old values for the budgets
+            before = copy.copy(expense)
+            new_tags = serializer.validated_data.get('tags')
+            old_values = audit.snapshot(before, tags=None if new_tags is None else expense.tags.all())
+            expense = serializer.save()
+            balances.replace_expense(before, expense)
+            alerts = budgets.replace_expense(before, expense)
+            changes = audit.diff(old_values, audit.snapshot(expense, tags=new_tags))
+            if changes:
+                audit.log_change(expense.pk, 'update', changes, actor_id=request.user.id)
+        return JsonResponse({**serializer.data, 'budget_alerts': BudgetStatusSerializer(alerts, many=True).data, 'message': 'Expense/Income updated successfully', 'status': HTTP_200_OK}, encoder=DjangoJSONEncoder)
     
     except ExpenseIncome.DoesNotExist:
         return JsonResponse({'error': 'Expense/Income record not found'}, status=HTTP_404_NOT_FOUND)
@@ -103,21 +227,76 @@ def update_expense(request, id):
 
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def delete_expense(request, id):
     try:
         user = request.user
-        if user.is_superuser:
-            expense = ExpenseIncome.objects.get(pk=id)
-        else:
-            expense = ExpenseIncome.objects.get(pk=id, user=user)
+        expenses = ExpenseIncome.objects.select_for_update()
+        if not user.is_superuser:
+            expenses = expenses.filter(user=user)
         
-        expense.delete()
+        # Soft delete: the row is hidden everywhere but can be restored until
+        # purge_deleted removes it
+        with transaction.atomic():
+            expense = expenses.get(pk=id)
+            if not expense.soft_delete():
+                # deleted by a concurrent request since it was read
+                raise ExpenseIncome.DoesNotExist
+            budgets.apply_expense(expense, sign=-1)
+            balances.apply_expense(expense, sign=-1)
+            audit.log_change(expense.pk, 'delete', {'deleted_at': [None, expense.deleted_at]}, actor_id=request.user.id)
         return Response({'message': 'Expense/Income deleted successfully'}, status=HTTP_204_NO_CONTENT)
     
     except ExpenseIncome.DoesNotExist:
         return JsonResponse({'error': 'Expense/Income record not found'}, status=HTTP_404_NOT_FOUND)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@idempotent
+def restore_expense(request, id):
+    """Bring back a deleted expense/income record that has not been purged yet"""
+    try:
+        user = request.user
+        deleted = ExpenseIncome.all_objects.filter(deleted_at__isnull=False).select_for_update()
+        if not user.is_superuser:
+            deleted = deleted.filter(user=user)
+        
+        with transaction.atomic():
+            expense = deleted.get(pk=id)
+            deleted_at = expense.deleted_at
+            if not expense.restore():
+                # restored by a concurrent request since it was read
+                raise ExpenseIncome.DoesNotExist
+            balances.apply_expense(expense)
+            alerts = budgets.apply_expense(expense)
+            audit.log_change(expense.pk, 'restore', {'deleted_at': [deleted_at, None]}, actor_id=request.user.id)
+        serializer = ExpenseIncomeSerializer(expense)
+        return JsonResponse({**serializer.data, 'budget_alerts': BudgetStatusSerializer(alerts, many=True).data, 'message': 'Expense/Income restored successfully', 'status': HTTP_200_OK}, encoder=DjangoJSONEncoder)
+    
+    except ExpenseIncome.DoesNotExist:
+        return JsonResponse({'error': 'Deleted Expense/Income record not found'}, status=HTTP_404_NOT_FOUND)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_expense_history(request, id):
+    """
+    Every recorded change of one expense/income record, oldest first,
+    including deletes and restores. Available for deleted records too.
+    """
+    user = request.user
+    owned = ExpenseIncome.all_objects.filter(pk=id)
+    if not user.is_superuser:
+        owned = owned.filter(user=user)
+    # Superusers can still read the history of a record that was purged
+    if not owned.exists() and not user.is_superuser:
+        return JsonResponse({'error': 'Expense/Income record not found'}, status=HTTP_404_NOT_FOUND)
+    
+    serializer = ExpenseIncomeChangeSerializer(audit.history(id), many=True)
+    return Response({'record': id, 'history': serializer.data}, status=HTTP_200_OK)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_expenses_by_type(request):
@@ -139,7 +318,404 @@ def get_expenses_by_type(request):
         else:
             expenses = ExpenseIncome.objects.filter(user=user)
     
-    serializer = ExpenseIncomeListSerializer(expenses[:20], many=True)
+    expenses = filter_by_category_and_tags(expenses, request)
+    if expenses is None:
+        return JsonResponse({'error': 'Invalid category or tag filter'}, status=HTTP_400_BAD_REQUEST)
+    
+    try:
+        expenses, serializer_class, fields, currency = project_list(expenses, request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=HTTP_400_BAD_REQUEST)
+    
+    serializer = serializer_class(expenses[:20], many=True, fields=fields)
     return Response(serializer.data, status=HTTP_200_OK)
 
 
+def _sum(field, transaction_type):
+    return Coalesce(Sum(field, filter=Q(transaction_type=transaction_type)), Value(Decimal('0.00')))
+
+
+def _money_totals(row):
+    # SQLite returns unrounded sums (122.727272727273); round them to the
+    # cent and render them as strings like every other amount
+    credit = budgets.to_money(row['total_credit'])
+    debit = budgets.to_money(row['total_debit'])
+    return {**row, 'total_credit': str(credit), 'total_debit': str(debit), 'balance': str(credit - debit)}
+
+
+def _with_balance(rows):
+    return [_money_totals(row) for row in rows]
+
+
+def _rounded_totals(expenses, *fields, **expressions):
+    """
+    Credit and debit totals of `expenses` grouped on `fields`, in the
+    queryset's order. Each record's total is rounded to the cent before it
+    is added, like the record `total`, budgets and balances, so the sums
+    match them exactly. Rows are grouped on the columns the total is
+    computed from, so the query returns one row per distinct amount rather
+    than per record.
+    """
+    keys = list(fields) + list(expressions)
+    rows = expenses.values(*fields, 'transaction_type', 'amount', 'tax', 'tax_type', **expressions).annotate(
+        records=Count('id'),
+    )
+    groups = {}
+    for row in rows:
+        group = groups.setdefault(tuple(row[key] for key in keys), {
+            **{key: row[key] for key in keys},
+            'total_credit': Decimal('0.00'),
+            'total_debit': Decimal('0.00'),
+            'count': 0,
+        })
+        total = budgets.to_money(ExpenseIncome.compute_total(row['amount'], row['tax'], row['tax_type']))
+        group[f"total_{row['transaction_type']}"] += total * row['records']
+        group['count'] += row['records']
+    return _with_balance(groups.values())
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_expense_summary(request):
+    """
+    Credit and debit totals. With ?currency=XXX every row is converted to
+    that currency in the same aggregate query, otherwise totals are grouped
+    per original currency. ?group_by=category adds a per-category breakdown.
+    """
+    user = request.user
+    
+    if user.is_superuser:
+        expenses = ExpenseIncome.objects.all()
+    else:
+        expenses = ExpenseIncome.objects.filter(user=user)
+    
+    expenses = filter_by_category_and_tags(expenses, request)
+    if expenses is None:
+        return JsonResponse({'error': 'Invalid category or tag filter'}, status=HTTP_400_BAD_REQUEST)
+    
+    group_by = request.query_params.get('group_by')
+    if group_by not in (None, 'category'):
+        return JsonResponse({'error': 'Invalid group_by value'}, status=HTTP_400_BAD_REQUEST)
+    
+    currency = request.query_params.get('currency')
+    if currency:
+        try:
+            currency = validate_currency_code(currency)
+        except ValidationError:
+            return JsonResponse({'error': 'Invalid currency code'}, status=HTTP_400_BAD_REQUEST)
+        
+        expenses = expenses.convert_to(currency)
+        totals = {
+            'total_credit': _sum('converted_total', 'credit'),
+            'total_debit': _sum('converted_total', 'debit'),
+            'count': Count('id'),
+            'missing_rates': Count('id', filter=Q(converted_total__isnull=True)),
+        }
+        if group_by == 'category':
+            rows = expenses.values('category', category_name=F('category__name')).annotate(**totals).order_by('category_name')
+            return Response({'currency': currency, 'categories': _with_balance(rows)}, status=HTTP_200_OK)
+        
+        # Converted totals depend on each row's rate, so they are summed
+        # first and rounded once; they aren't compared with the balance
+        summary = _money_totals(expenses.aggregate(**totals))
+        return Response({'currency': currency, **summary}, status=HTTP_200_OK)
+    
+    if group_by == 'category':
+        rows = _rounded_totals(
+            expenses.order_by('category__name', 'currency'), 'category', 'currency', category_name=F('category__name'),
+        )
+    else:
+        rows = _rounded_totals(expenses.order_by('currency'), 'currency')
+    
+    key = 'categories' if group_by == 'category' else 'currencies'
+    return Response({key: rows}, status=HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_expense_report(request):
+    """
+    Yearly statistics of the user's own records per currency: monthly
+    totals, a rolling average of spending over ?window= months, debit
+    percentiles and a tax breakdown by tax type. Large reports are computed
+    in the background; until then a 202 is returned and the client retries.
+    """
+    params = request.query_params
+    try:
+        year = int(params.get('year', timezone.localdate().year))
+        window = int(params.get('window', 3))
+    except ValueError:
+        return JsonResponse({'error': 'year and window must be integers'}, status=HTTP_400_BAD_REQUEST)
+    if not 1 <= window <= 12:
+        return JsonResponse({'error': 'window must be between 1 and 12 months'}, status=HTTP_400_BAD_REQUEST)
+
+    currency = params.get('currency')
+    if currency:
+        try:
+            currency = validate_currency_code(currency)
+        except ValidationError:
+            return JsonResponse({'error': 'Invalid currency code'}, status=HTTP_400_BAD_REQUEST)
+
+    report = reports.yearly_report(request.user.id, year, window, currency)
+    if report is None:
+        return Response({'status': 'pending'}, status=HTTP_202_ACCEPTED, headers={'Retry-After': '5'})
+
+    # DjangoJSONEncoder renders the Decimal amounts as strings
+    return JsonResponse({'year': year, 'window': window, 'currencies': report}, encoder=DjangoJSONEncoder)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def categories(request):
+    """List or create the authenticated user's categories"""
+    if request.method == 'POST':
+        serializer = CategorySerializer(data=request.data, context={'request': request})
+        if serializer.is_valid():
+            serializer.save(user=request.user)
+            return Response(serializer.data, status=HTTP_201_CREATED)
+        return JsonResponse(serializer.errors, status=HTTP_400_BAD_REQUEST)
+    
+    serializer = CategorySerializer(Category.objects.filter(user=request.user), many=True)
+    return Response(serializer.data, status=HTTP_200_OK)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def tags(request):
+    """List or create the authenticated user's tags"""
+    if request.method == 'POST':
+        serializer = TagSerializer(data=request.data, context={'request': request})
+        if serializer.is_valid():
+            serializer.save(user=request.user)
+            return Response(serializer.data, status=HTTP_201_CREATED)
+        return JsonResponse(serializer.errors, status=HTTP_400_BAD_REQUEST)
+    
+    serializer = TagSerializer(Tag.objects.filter(user=request.user), many=True)
+    return Response(serializer.data, status=HTTP_200_OK)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def recurring_rules(request):
+    """List or create the authenticated user's recurring transactions"""
+    if request.method == 'POST':
+        serializer = RecurringRuleSerializer(data=request.data, context={'request': request})
+        if serializer.is_valid():
+            serializer.save(user=request.user)
+            return Response(serializer.data, status=HTTP_201_CREATED)
+        return JsonResponse(serializer.errors, status=HTTP_400_BAD_REQUEST)
+    
+    rules = RecurringRule.objects.filter(user=request.user)
+    serializer = RecurringRuleSerializer(rules, many=True, context={'request': request})
+    return Response(serializer.data, status=HTTP_200_OK)
+
+
+@api_view(['DELETE'])
+@permission_classes([IsAuthenticated])
+def delete_recurring_rule(request, id):
+    # Stops future occurrences; rows already created are kept
+    try:
+        rule = RecurringRule.objects.get(pk=id, user=request.user)
+        rule.delete()
+        return Response({'message': 'Recurring rule deleted successfully'}, status=HTTP_204_NO_CONTENT)
+    
+    except RecurringRule.DoesNotExist:
+        return JsonResponse({'error': 'Recurring rule not found'}, status=HTTP_404_NOT_FOUND)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def budget_list(request):
+    """List the authenticated user's budgets with their current period status, or create one"""
+    if request.method == 'POST':
+        serializer = BudgetSerializer(data=request.data, context={'request': request})
+        if serializer.is_valid():
+            with transaction.atomic():
+                budget = serializer.save(user=request.user)
+                # seed the running totals from the records that already exist
+                budgets.recompute_budget(budget)
+            return Response(BudgetStatusSerializer(budgets.current_statuses([budget])[0]).data, status=HTTP_201_CREATED)
+        return JsonResponse(serializer.errors, status=HTTP_400_BAD_REQUEST)
+    
+    statuses = budgets.current_statuses(Budget.objects.filter(user=request.user))
+    return Response(BudgetStatusSerializer(statuses, many=True).data, status=HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_budget(request, id):
+    # Current period status of one budget, read from its running total
+    try:
+        budget = Budget.objects.get(pk=id, user=request.user)
+    except Budget.DoesNotExist:
+        return JsonResponse({'error': 'Budget not found'}, status=HTTP_404_NOT_FOUND)
+    
+    return Response(BudgetStatusSerializer(budgets.current_statuses([budget])[0]).data, status=HTTP_200_OK)
+
+
+@api_view(['DELETE'])
+@permission_classes([IsAuthenticated])
+def delete_budget(request, id):
+    try:
+        budget = Budget.objects.get(pk=id, user=request.user)
+        budget.delete()
+        return Response({'message': 'Budget deleted successfully'}, status=HTTP_204_NO_CONTENT)
+    
+    except Budget.DoesNotExist:
+        return JsonResponse({'error': 'Budget not found'}, status=HTTP_404_NOT_FOUND)
+
+
+# Superuser analytics across all users. Every endpoint is keyset paginated
+# with ?cursor= (the `next` value of the previous page) and runs a single
+# query per page, however many users or records there are.
+
+ADMIN_PAGE_SIZE = 50
+ADMIN_MAX_PAGE_SIZE = 200
+
+
+def _admin_page_size(request, default=ADMIN_PAGE_SIZE):
+    try:
+        page_size = int(request.query_params.get('page_size', default))
+    except ValueError:
+        return None
+    if page_size < 1:
+        return None
+    return min(page_size, ADMIN_MAX_PAGE_SIZE)
+
+
+def _start_of_day(value):
+    # Day boundaries as datetimes so created_at filters can use its index
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(f'Invalid date: {value}')
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _filter_admin_expenses(expenses, request):
+    """
+    Shared ?user=, ?type=, ?start= and ?end= (YYYY-MM-DD, inclusive)
+    filters. Returns None when a value is invalid.
+    """
+    user_id = request.query_params.get('user')
+    transaction_type = request.query_params.get('type')
+    start = request.query_params.get('start')
+    end = request.query_params.get('end')
+    
+    try:
+        if user_id:
+            expenses = expenses.filter(user_id=int(user_id))
+        if start:
+            expenses = expenses.filter(created_at__gte=_start_of_day(start))
+        if end:
+            expenses = expenses.filter(created_at__lt=_start_of_day(end) + timedelta(days=1))
+    except ValueError:
+        return None
+    
+    if transaction_type:
+        if transaction_type not in ('credit', 'debit'):
+            return None
+        expenses = expenses.filter(transaction_type=transaction_type)
+    return expenses
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsSuperuser])
+def admin_expenses(request):
+    """All users' records, newest first, with their owner"""
+    page_size = _admin_page_size(request)
+    expenses = _filter_admin_expenses(ExpenseIncome.objects.all(), request)
+    if page_size is None or expenses is None:
+        return JsonResponse({'error': 'Invalid filter or page parameters'}, status=HTTP_400_BAD_REQUEST)
+    
+    expenses = AdminExpenseIncomeListSerializer().project(expenses).order_by('-created_at', '-id')
+    
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        try:
+            created_at, last_id = decode_cursor(cursor)
+            created_at = parse_datetime(cursor_value(created_at, str))
+            last_id = cursor_value(last_id, int)
+            if created_at is None:
+                raise ValueError
+        except (ValueError, TypeError):
+            return JsonResponse({'error': 'Invalid cursor'}, status=HTTP_400_BAD_REQUEST)
+        expenses = expenses.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=last_id))
+    
+    rows, next_cursor = keyset_page(expenses, page_size, lambda row: [row.created_at.isoformat(), row.id])
+    serializer = AdminExpenseIncomeListSerializer(rows, many=True)
+    return Response({'next': next_cursor, 'results': serializer.data}, status=HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsSuperuser])
+def admin_user_totals(request):
+    """Per-user, per-currency totals and activity counts from one grouped query"""
+    page_size = _admin_page_size(request)
+    expenses = _filter_admin_expenses(ExpenseIncome.objects.all(), request)
+    if page_size is None or expenses is None:
+        return JsonResponse({'error': 'Invalid filter or page parameters'}, status=HTTP_400_BAD_REQUEST)
+    
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        try:
+            last_user_id, last_currency = decode_cursor(cursor)
+            last_user_id = cursor_value(last_user_id, int)
+            last_currency = cursor_value(last_currency, str)
+        except (ValueError, TypeError):
+            return JsonResponse({'error': 'Invalid cursor'}, status=HTTP_400_BAD_REQUEST)
+        expenses = expenses.filter(Q(user_id__gt=last_user_id) | Q(user_id=last_user_id, currency__gt=last_currency))
+    
+    rows = expenses.with_total().values('user_id', 'currency', username=F('user__username')).order_by('user_id', 'currency').annotate(
+        count=Count('id'),
+        credit_count=Count('id', filter=Q(transaction_type='credit')),
+        debit_count=Count('id', filter=Q(transaction_type='debit')),
+        total_credit=_sum('db_total', 'credit'),
+        total_debit=_sum('db_total', 'debit'),
+        first_activity=Min('created_at'),
+        last_activity=Max('created_at'),
+    )
+    
+    rows, next_cursor = keyset_page(rows, page_size, lambda row: [row['user_id'], row['currency']])
+    return Response({'next': next_cursor, 'results': _with_balance(rows)}, status=HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsSuperuser])
+def admin_top_spenders(request):
+    """
+    Users ranked by their total debits (or ?type=credit) in one currency,
+    BASE_CURRENCY unless ?currency= is given.
+    """
+    page_size = _admin_page_size(request, default=10)
+    expenses = _filter_admin_expenses(ExpenseIncome.objects.all(), request)
+    if page_size is None or expenses is None:
+        return JsonResponse({'error': 'Invalid filter or page parameters'}, status=HTTP_400_BAD_REQUEST)
+    
+    try:
+        currency = validate_currency_code(request.query_params.get('currency', settings.BASE_CURRENCY))
+    except ValidationError:
+        return JsonResponse({'error': 'Invalid currency code'}, status=HTTP_400_BAD_REQUEST)
+    if not request.query_params.get('type'):
+        expenses = expenses.filter(transaction_type='debit')
+    
+    # Rounded to the cent in the query, so users with equal totals compare
+    # equal even where SQLite sums in floating point (136957.1717...)
+    rows = expenses.filter(currency=currency).with_total().values('user_id', username=F('user__username')).order_by().annotate(
+        total=Round(Sum('db_total'), 2, output_field=MONEY_FIELD),
+        count=Count('id'),
+    ).order_by('-total', 'user_id')
+    
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        try:
+            last_total, last_user_id = decode_cursor(cursor)
+            last_total = Value(budgets.to_money(Decimal(cursor_value(last_total, str))), output_field=MONEY_FIELD)
+            last_user_id = cursor_value(last_user_id, int)
+        except (ValueError, TypeError, InvalidOperation):
+            return JsonResponse({'error': 'Invalid cursor'}, status=HTTP_400_BAD_REQUEST)
+        # compares against the aggregate, so this becomes a HAVING clause
+        rows = rows.filter(Q(total__lt=last_total) | Q(total=last_total, user_id__gt=last_user_id))
+    
+    rows, next_cursor = keyset_page(rows, page_size, lambda row: [str(budgets.to_money(row['total'])), row['user_id']])
+    results = [{**row, 'total': str(budgets.to_money(row['total']))} for row in rows]
+    return Response({'currency': currency, 'next': next_cursor, 'results': results}, status=HTTP_200_OK)
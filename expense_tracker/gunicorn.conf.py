@@ -0,0 +1,16 @@
+# Gunicorn settings for API-only deployments, run from this directory with:
+#
+#   gunicorn -c gunicorn.conf.py
+#
+# The app is loaded once in the master with the lean settings profile and
+# every view imported up front (see expense_tracker/wsgi.py), then workers
+# are forked and share that memory copy-on-write.
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'expense_tracker.settings_api')
+os.environ.setdefault('DJANGO_PRELOAD', '1')
+
+wsgi_app = 'expense_tracker.wsgi:application'
+preload_app = True
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))